@@ -0,0 +1,215 @@
+# Headless batch summarization: python batch_summarize.py sources.txt -o summaries.jsonl
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from langchain_core.rate_limiters import InMemoryRateLimiter
+from langchain_groq import ChatGroq
+
+from extractors import load_source_docs
+from near_duplicates import NearDuplicateIndex
+from pipeline_events import PipelineTracker
+from source_cache import SourceCache
+from pipeline import is_incremental_source, summarize_docs
+from source_identity import source_key
+from summary_cache import SummaryCache
+
+MODELS = ["deepseek-r1-distill-qwen-32b", "llama3-70b-8192", "mixtral-8x7b-32768"]
+
+
+def read_sources(path):
+    """Read one YouTube URL, website URL or PDF path per line, skipping blanks and # comments."""
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+
+
+def read_completed(output_path):
+    """Return ``(source, model, summary_style, summary_length)`` of every record summarized successfully before.
+
+    A source counts as done only for the settings it was summarized with, so
+    re-running with another model, style or length summarizes it again.
+    """
+    completed = set()
+    if not os.path.exists(output_path):
+        return completed
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # a line cut short by an interrupted run
+            if not record.get("error"):
+                completed.add((record["source"], record.get("model"), record.get("summary_style"),
+                               record.get("summary_length")))
+    return completed
+
+
+def drop_partial_line(output_path):
+    """Truncate ``output_path`` after its last newline, so new records never follow a line cut short."""
+    try:
+        f = open(output_path, "rb+")
+    except FileNotFoundError:
+        return
+    with f:
+        end = position = f.seek(0, os.SEEK_END)
+        while position > 0:
+            start = max(0, position - 64 * 1024)
+            f.seek(start)
+            newline = f.read(position - start).rfind(b"\n")
+            if newline != -1:
+                break
+            position = start
+        else:
+            start, newline = 0, -1
+        if start + newline + 1 != end:
+            f.truncate(start + newline + 1)
+
+
+def build_llm(model, api_key, requests_per_minute):
+    # Every summarization thread shares this client, so the limiter paces all calls together
+    rate_limiter = InMemoryRateLimiter(requests_per_second=requests_per_minute / 60, max_bucket_size=4)
+    return ChatGroq(model=model, api_key=api_key, rate_limiter=rate_limiter, max_retries=6)
+
+
+class BatchRunner:
+    """Extracts sources on one thread pool and summarizes them on another.
+
+    Results are appended to the output file as each source finishes, so an
+    interrupted run can be resumed and skip what is already done.
+    """
+
+    def __init__(self, llm, model, summary_style, summary_length, fetch_workers=8, llm_workers=4,
+                 max_concurrency=4, use_cache=True, compress_ratio=None):
+        self.llm = llm
+        self.model = model
+        self.summary_style = summary_style
+        self.summary_length = summary_length
+        self.fetch_workers = fetch_workers
+        self.llm_workers = llm_workers
+        self.max_concurrency = max_concurrency
+        self.compress_ratio = compress_ratio
+        self.source_cache = SourceCache() if use_cache else None
+        self.summary_cache = SummaryCache() if use_cache else None
+        self.near_duplicates = NearDuplicateIndex() if use_cache else None
+
+    def _extract(self, source):
+        tracker = PipelineTracker()
+        # Decided before loading, which stores the page in the source cache
+        incremental = is_incremental_source(source, self.source_cache)
+        docs, source_info = load_source_docs(source, self.source_cache, tracker)
+        return docs, source_info, tracker, incremental
+
+    def _summarize(self, source, docs, tracker, incremental):
+        summary, _ = summarize_docs(docs, self.llm, self.model, self.summary_style, self.summary_length,
+                                    compress_ratio=self.compress_ratio, summary_cache=self.summary_cache,
+                                    max_concurrency=self.max_concurrency, tracker=tracker,
+                                    incremental=incremental, near_duplicates=self.near_duplicates,
+                                    source_id=source_key(source) if self.near_duplicates is not None else None)
+        return summary
+
+    def _record(self, source, summary=None, source_info=None, tracker=None, error=None):
+        return {
+            "source": source,
+            "model": self.model,
+            "summary_style": self.summary_style,
+            "summary_length": self.summary_length,
+            "source_info": source_info,
+            "summary": summary,
+            "timings": tracker.breakdown() if tracker else [],
+            "plan": tracker.notes.get("plan") if tracker else None,
+            "near_duplicate": tracker.notes.get("near_duplicate") if tracker else None,
+            "chapters": tracker.notes.get("chapters") if tracker else None,
+            "answered_by": tracker.notes.get("answered_by") if tracker else None,
+            "error": error,
+        }
+
+    def run(self, sources, out):
+        """Summarize ``sources`` and write one JSON line per source to ``out``; returns the error count."""
+        pending = iter(sources)
+        # Cap the work in flight so extracted text doesn't pile up faster than the LLM drains it
+        max_in_flight = self.fetch_workers + 2 * self.llm_workers
+        errors = 0
+        with ThreadPoolExecutor(self.fetch_workers) as fetch_pool, ThreadPoolExecutor(self.llm_workers) as llm_pool:
+            futures = {}
+
+            def top_up():
+                while len(futures) < max_in_flight:
+                    source = next(pending, None)
+                    if source is None:
+                        return
+                    futures[fetch_pool.submit(self._extract, source)] = ("extract", source, None, None)
+
+            top_up()
+            while futures:
+                finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    stage, source, source_info, tracker = futures.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        errors += 1
+                        record = self._record(source, source_info=source_info, tracker=tracker,
+                                              error=f"{stage}: {e}")
+                    else:
+                        if stage == "extract":
+                            docs, source_info, tracker, incremental = result
+                            futures[llm_pool.submit(self._summarize, source, docs, tracker, incremental)] = ("summarize", source, source_info, tracker)
+                            continue
+                        record = self._record(source, summary=result, source_info=source_info, tracker=tracker)
+                    out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    out.flush()
+                top_up()
+        return errors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summarize YouTube videos, websites and PDFs in bulk.")
+    parser.add_argument("sources", help="text file with one YouTube URL, website URL or PDF path per line")
+    parser.add_argument("-o", "--output", default="summaries.jsonl", help="JSONL file to append results to")
+    parser.add_argument("--model", choices=MODELS, default=MODELS[0])
+    parser.add_argument("--style", choices=["Concise", "Detailed", "Bullet Points"], default="Concise")
+    parser.add_argument("--length", type=int, default=300, help="summary length in words")
+    parser.add_argument("--fetch-workers", type=int, default=8, help="concurrent source downloads")
+    parser.add_argument("--llm-workers", type=int, default=4, help="sources summarized at the same time")
+    parser.add_argument("--max-concurrency", type=int, default=4, help="parallel chunk calls per source")
+    parser.add_argument("--requests-per-minute", type=float, default=30, help="Groq request budget")
+    parser.add_argument("--compress-ratio", type=float, help="pre-compress long inputs to this share of tokens")
+    parser.add_argument("--no-cache", action="store_true", help="skip the source and summary caches")
+    parser.add_argument("--restart", action="store_true", help="ignore results already in the output file")
+    args = parser.parse_args(argv)
+
+    api_key = os.environ.get("GROQ_API_KEY")
+    if not api_key:
+        parser.error("set GROQ_API_KEY in the environment")
+
+    sources = read_sources(args.sources)
+    if not args.restart:
+        drop_partial_line(args.output)
+    completed = set() if args.restart else read_completed(args.output)
+    todo = [source for source in sources if (source, args.model, args.style, args.length) not in completed]
+    print(f"{len(todo)} to summarize, {len(sources) - len(todo)} already done", file=sys.stderr)
+
+    runner = BatchRunner(
+        build_llm(args.model, api_key, args.requests_per_minute),
+        args.model,
+        args.style,
+        args.length,
+        fetch_workers=args.fetch_workers,
+        llm_workers=args.llm_workers,
+        max_concurrency=args.max_concurrency,
+        use_cache=not args.no_cache,
+        compress_ratio=args.compress_ratio,
+    )
+    started = time.perf_counter()
+    with open(args.output, "w" if args.restart else "a", encoding="utf-8") as out:
+        errors = runner.run(todo, out)
+    print(f"Finished in {time.perf_counter() - started:.1f}s with {errors} errors", file=sys.stderr)
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,58 @@
+# Compare the fast HTML extractor with the unstructured partitioner UnstructuredURLLoader uses.
+# Run from the repository root: python benchmarks/bench_html_extraction.py [--repeat 20]
+
+import argparse
+import glob
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from html_extraction import extract_main_text, parse_with_unstructured  # noqa: E402
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "html")
+
+
+def time_call(func, html, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        text = func(html)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings), len(text)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark HTML text extraction on saved pages.")
+    parser.add_argument("--repeat", type=int, default=20, help="runs per fixture and extractor")
+    parser.add_argument("--fixtures", default=FIXTURE_DIR, help="directory of saved .html pages")
+    args = parser.parse_args()
+
+    # unstructured is imported lazily, so the first call also pays for its import
+    started = time.perf_counter()
+    try:
+        import unstructured.partition.html  # noqa: F401
+        extractors = [("fast", extract_main_text), ("unstructured", parse_with_unstructured)]
+        print(f"unstructured import: {(time.perf_counter() - started) * 1000:.0f} ms")
+    except ImportError:
+        extractors = [("fast", extract_main_text)]
+        print("unstructured is not installed; timing the fast path only")
+
+    print(f"{'fixture':<24}{'extractor':<14}{'median ms':>10}{'chars':>8}")
+    totals = {name: 0.0 for name, _ in extractors}
+    for path in sorted(glob.glob(os.path.join(args.fixtures, "*.html"))):
+        with open(path, encoding="utf-8") as f:
+            html = f.read()
+        for name, func in extractors:
+            seconds, chars = time_call(func, html, args.repeat)
+            totals[name] += seconds
+            print(f"{os.path.basename(path):<24}{name:<14}{seconds * 1000:>10.2f}{chars:>8}")
+
+    if "unstructured" in totals and totals["fast"]:
+        print(f"fast path speed-up: {totals['unstructured'] / totals['fast']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+# Measure how much extractive pre-compression shrinks long inputs and how long it takes.
+# Run from the repository root: python benchmarks/bench_precompression.py [--ratio 0.35]
+
+import argparse
+import glob
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from html_extraction import extract_main_text  # noqa: E402
+from precompression import compress_text  # noqa: E402
+from summarization import estimate_tokens  # noqa: E402
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "html")
+FILLER = ["you know", "so basically", "um", "like I said", "right", "and so on", "as I mentioned earlier"]
+
+
+def build_corpus(sentences, words, punctuated, seed=0):
+    # Fixture sentences in random order, repeated, with filler sprinkled in; without
+    # punctuation it looks like auto-generated YouTube captions
+    rng = random.Random(seed)
+    out, count = [], 0
+    while count < words:
+        sentence = rng.choice(sentences)
+        if rng.random() < 0.3:
+            sentence = f"{rng.choice(FILLER)} {sentence}"
+        out.append(sentence + "." if punctuated else sentence)
+        count += len(sentence.split())
+    return " ".join(out)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark extractive pre-compression.")
+    parser.add_argument("--ratio", type=float, default=0.35, help="target share of tokens to keep")
+    parser.add_argument("--sizes", default="5000,20000,100000", help="comma separated corpus sizes in words")
+    args = parser.parse_args()
+
+    sentences = []
+    for path in sorted(glob.glob(os.path.join(FIXTURE_DIR, "*.html"))):
+        with open(path, encoding="utf-8") as f:
+            text = extract_main_text(f.read())
+        sentences.extend(s.rstrip(".") for s in text.replace("\n", " ").split(". ") if len(s.split()) > 4)
+
+    print(f"{'corpus':<12}{'words':>8}{'tokens in':>11}{'tokens out':>12}{'ratio':>8}{'ms':>10}")
+    for punctuated, label in ((True, "article"), (False, "transcript")):
+        for words in (int(size) for size in args.sizes.split(",")):
+            text = build_corpus(sentences, words, punctuated)
+            started = time.perf_counter()
+            compressed = compress_text(text, args.ratio)
+            elapsed = time.perf_counter() - started
+            tokens_in, tokens_out = estimate_tokens(text), estimate_tokens(compressed)
+            print(f"{label:<12}{words:>8}{tokens_in:>11}{tokens_out:>12}{tokens_out / tokens_in:>8.2f}{elapsed * 1000:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+# Fixture corpus for the benchmarks: saved HTML pages, a transcript and generated PDFs
+
+import glob
+import json
+import os
+import random
+import re
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from html_extraction import extract_main_text  # noqa: E402
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+HTML_DIR = os.path.join(FIXTURE_DIR, "html")
+TRANSCRIPT_DIR = os.path.join(FIXTURE_DIR, "transcripts")
+# Generated on first use and git-ignored; PDFs of a few hundred pages are too big to commit
+PDF_DIR = os.path.join(FIXTURE_DIR, "pdf")
+WORDS_PER_PDF_PAGE = 350
+
+
+def html_pages():
+    """Return ``{file name: html}`` for the saved pages."""
+    pages = {}
+    for path in sorted(glob.glob(os.path.join(HTML_DIR, "*.html"))):
+        with open(path, encoding="utf-8") as f:
+            pages[os.path.basename(path)] = f.read()
+    return pages
+
+
+def transcripts():
+    """Return ``{file name: segments}``; segments have ``text``, ``start`` and ``duration``."""
+    segments = {}
+    for path in sorted(glob.glob(os.path.join(TRANSCRIPT_DIR, "*.json"))):
+        with open(path, encoding="utf-8") as f:
+            segments[os.path.basename(path)] = json.load(f)
+    return segments
+
+
+def sentences():
+    """Sentences of the saved pages, the raw material for synthetic corpora."""
+    found = []
+    for html in html_pages().values():
+        found.extend(s for s in re.split(r"(?<=[.!?])\s+", extract_main_text(html)) if len(s.split()) > 4)
+    return found
+
+
+def corpus(words, seed=0):
+    """Return about ``words`` words of fixture sentences in paragraphs, the same for the same seed."""
+    rng = random.Random(seed)
+    pool = sentences()
+    paragraphs, count = [], 0
+    while count < words:
+        paragraph = " ".join(rng.choice(pool) for _ in range(rng.randint(3, 8)))
+        paragraphs.append(paragraph)
+        count += len(paragraph.split())
+    return "\n\n".join(paragraphs)
+
+
+def pdf_fixture(pages):
+    """Return the path of a ``pages``-page text PDF, generating it with PyMuPDF if needed."""
+    import fitz
+
+    path = os.path.join(PDF_DIR, f"document_{pages}p.pdf")
+    if os.path.exists(path):
+        return path
+    os.makedirs(PDF_DIR, exist_ok=True)
+    words = corpus(pages * WORDS_PER_PDF_PAGE, seed=pages).split(" ")
+    doc = fitz.open()
+    for page_number in range(pages):
+        page = doc.new_page()
+        text = " ".join(words[page_number * WORDS_PER_PDF_PAGE:(page_number + 1) * WORDS_PER_PDF_PAGE])
+        page.insert_textbox(fitz.Rect(50, 50, page.rect.width - 50, page.rect.height - 50), text, fontsize=9)
+    tmp_path = path + ".tmp"
+    doc.save(tmp_path)
+    doc.close()
+    os.replace(tmp_path, path)
+    return path
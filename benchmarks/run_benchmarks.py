@@ -0,0 +1,333 @@
+# Offline benchmarks of every pipeline stage, with machine-readable results for comparing revisions.
+# Run from the repository root: python benchmarks/run_benchmarks.py -o results.json [--compare baseline.json]
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain.schema import Document  # noqa: E402
+
+from chain_planner import plan_summary  # noqa: E402
+from chapters import split_chapters  # noqa: E402
+from extractors import load_youtube_docs  # noqa: E402
+from fixture_data import corpus, html_pages, pdf_fixture, transcripts  # noqa: E402
+from html_extraction import extract_main_text, parse_with_unstructured  # noqa: E402
+from pdf_extraction import DEFAULT_MAX_WORKERS, extract_pdf_text  # noqa: E402
+from pipeline import summarize_source  # noqa: E402
+from precompression import compress_text  # noqa: E402
+from source_cache import SourceCache  # noqa: E402
+from stub_llm import StubChatModel  # noqa: E402
+from summarization import build_prompt, estimate_tokens, split_documents, split_stable, summarize  # noqa: E402
+
+GROUPS = ("extract", "chunk", "compress", "chain", "end_to_end", "startup")
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_HOST = "https://bench.invalid/"
+# 11 characters, so it passes as a real video ID
+BENCH_VIDEO_URL = "https://www.youtube.com/watch?v=benchmark01"
+
+
+class MemoryBackend:
+    """SourceCache backend that keeps entries in a dict instead of on disk."""
+
+    def __init__(self):
+        self.entries = {}
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def set(self, key, entry):
+        self.entries[key] = entry
+
+
+def offline_source_cache():
+    # Serves the fixture pages and transcript; zero TTLs make every call fetch and parse again
+    pages = html_pages()
+    segments = next(iter(transcripts().values()))
+    return SourceCache(
+        backend=MemoryBackend(),
+        ttls={"youtube": 0, "website": 0},
+        fetch_transcript=lambda video_id, languages=None: (segments, "en"),
+        fetch_page=lambda url, etag=None, last_modified=None: (200, pages[url[len(BENCH_HOST):]], None, None),
+    )
+
+
+def measure(func, repeat):
+    """Median and best wall time over ``repeat`` runs after a warm-up, and peak Python heap of one more run.
+
+    Peak memory comes from tracemalloc, so it covers Python allocations in this
+    process only: not PyMuPDF's C buffers or the PDF worker processes.
+    """
+    func()  # warm-up: lazy imports, the PDF process pool, regex compilation
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"median_seconds": statistics.median(timings), "min_seconds": min(timings), "peak_mb": peak / 2 ** 20}
+
+
+def result(group, name, case, stats, amount=None, unit=None, **extra):
+    row = {
+        "group": group,
+        "name": name,
+        "case": case,
+        "median_seconds": round(stats["median_seconds"], 6),
+        "min_seconds": round(stats["min_seconds"], 6),
+        "peak_mb": round(stats["peak_mb"], 2),
+    }
+    if amount is not None:
+        row["throughput"] = round(amount / max(stats["median_seconds"], 1e-9), 1)
+        row["throughput_unit"] = unit
+    row.update(extra)
+    return row
+
+
+def bench_extract(args):
+    for pages in args.pdf_pages:
+        path = pdf_fixture(pages)
+        for name, workers in (("pdf/fitz-serial", 1), ("pdf/fitz-parallel", DEFAULT_MAX_WORKERS)):
+            stats = measure(lambda: extract_pdf_text(path, max_workers=workers), args.repeat)
+            yield result("extract", name, f"{pages} pages", stats, pages, "pages/s")
+
+    try:
+        import unstructured.partition.html  # noqa: F401
+        extractors = [("html/fast", extract_main_text), ("html/unstructured", parse_with_unstructured)]
+    except ImportError:
+        print("unstructured is not installed; timing the fast HTML path only", file=sys.stderr)
+        extractors = [("html/fast", extract_main_text)]
+    for page, html in html_pages().items():
+        for name, func in extractors:
+            stats = measure(lambda: func(html), args.repeat)
+            yield result("extract", name, page, stats, len(html.encode("utf-8")) / 1024, "KB/s")
+
+    source_cache = offline_source_cache()
+    segments = next(iter(transcripts().values()))
+    stats = measure(lambda: load_youtube_docs(BENCH_VIDEO_URL, source_cache), args.repeat)
+    yield result("extract", "transcript", f"{len(segments)} segments", stats, len(segments), "segments/s")
+
+
+def bench_chunk(args):
+    for words in args.corpus_words:
+        docs = [Document(page_content=corpus(words))]
+        tokens = estimate_tokens(docs[0].page_content)
+        for name, func in (("split_documents", split_documents), ("split_stable", split_stable)):
+            stats = measure(lambda: func(docs), args.repeat)
+            yield result("chunk", name, f"{words} words", stats, tokens, "tokens/s", chunks=len(func(docs)))
+
+    for name, segments in transcripts().items():
+        stats = measure(lambda: split_chapters(segments), args.repeat)
+        yield result("chunk", "split_chapters", name, stats, len(segments), "segments/s",
+                     chunks=len(split_chapters(segments)))
+
+
+def bench_compress(args):
+    for words in args.corpus_words:
+        text = corpus(words)
+        stats = measure(lambda: compress_text(text), args.repeat)
+        kept = len(compress_text(text)) / len(text)
+        yield result("compress", "textrank", f"{words} words", stats, estimate_tokens(text), "tokens/s",
+                     kept_ratio=round(kept, 3))
+
+
+def bench_chain(args):
+    prompt = build_prompt("Concise", 300)
+    for model in args.models:
+        for words in args.corpus_words:
+            docs = [Document(page_content=corpus(words))]
+            plan = plan_summary(docs, model, 300)
+            llm = StubChatModel(latency=args.llm_latency, tokens_per_second=args.llm_tps)
+            summarize(llm, docs, prompt, plan)
+            calls = llm.calls
+            stats = measure(lambda: summarize(llm, docs, prompt, plan), args.repeat)
+            yield result("chain", f"{plan.strategy}/{model}", f"{words} words", stats, plan.input_tokens, "tokens/s",
+                         llm_calls=calls)
+
+
+def bench_end_to_end(args):
+    source_cache = offline_source_cache()
+    sources = [(f"pdf/{pages}p", pdf_fixture(pages)) for pages in args.pdf_pages]
+    sources += [(f"website/{page}", BENCH_HOST + page) for page in html_pages()]
+    sources.append(("youtube/transcript", BENCH_VIDEO_URL))
+    for name, source in sources:
+        llm = StubChatModel(latency=args.llm_latency, tokens_per_second=args.llm_tps)
+        run = lambda: summarize_source(source, llm, args.models[0], "Concise", 300, source_cache=source_cache)  # noqa: E731
+        strategy = run()["plan"]["strategy"]
+        calls = llm.calls
+        stats = measure(run, args.repeat)
+        yield result("end_to_end", name, args.models[0], stats, strategy=strategy, llm_calls=calls)
+
+
+# Dependencies that should load only once a run needs them, never on import or first render
+HEAVY_MODULES = ("langchain", "langchain_core", "langchain_groq", "fitz", "unstructured", "youtube_transcript_api",
+                 "numpy")
+STARTUP_MODULES = ("pipeline", "extractors", "summarization")
+STARTUP_APPS = ("app.py", "final_app.py")
+# Peak resident set of the probe itself, in KB. Linux's ru_maxrss would also count the
+# benchmark process the probe was forked from, so read VmHWM, which exec resets, where it exists
+PEAK_RSS = """
+import resource
+def peak_rss_kb():
+    try:
+        with open("/proc/self/status") as f:
+            return int(next(line for line in f if line.startswith("VmHWM:")).split()[1])
+    except (OSError, StopIteration):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+"""
+# Each probe runs in a fresh interpreter and prints one JSON line
+IMPORT_PROBE = PEAK_RSS + """
+import json, sys, time
+started = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - started
+heavy = sorted({{name.split(".")[0] for name in sys.modules}} & set({heavy!r}))
+print(json.dumps({{"seconds": seconds, "maxrss_kb": peak_rss_kb(), "heavy": heavy}}))
+"""
+RENDER_PROBE = PEAK_RSS + """
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file({path!r}, default_timeout=120)
+started = time.perf_counter()
+app.run()
+first = time.perf_counter() - started
+started = time.perf_counter()
+app.run()
+rerun = time.perf_counter() - started
+heavy = sorted({{name.split(".")[0] for name in sys.modules}} & set({heavy!r}))
+print(json.dumps({{"seconds": first, "rerun_seconds": rerun, "errors": len(app.exception),
+                  "maxrss_kb": peak_rss_kb(), "heavy": heavy}}))
+"""
+
+
+def probe(script, repeat):
+    """Run ``script`` in ``repeat`` fresh interpreters; returns the parsed JSON line of each run."""
+    runs = []
+    for _ in range(repeat):
+        completed = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, cwd=REPO_DIR)
+        if completed.returncode:
+            raise RuntimeError(completed.stderr.strip().splitlines()[-1])
+        runs.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+    return runs
+
+
+def probe_stats(runs, key="seconds"):
+    # Resident memory of the whole interpreter, unlike the tracemalloc peak of the in-process groups
+    timings = [run[key] for run in runs]
+    return {"median_seconds": statistics.median(timings), "min_seconds": min(timings),
+            "peak_mb": max(run["maxrss_kb"] for run in runs) / 1024}
+
+
+def bench_startup(args):
+    for module in STARTUP_MODULES:
+        runs = probe(IMPORT_PROBE.format(module=module, heavy=HEAVY_MODULES), args.repeat)
+        yield result("startup", f"import/{module}", "cold", probe_stats(runs), heavy_modules=runs[0]["heavy"])
+    try:
+        import streamlit.testing.v1  # noqa: F401
+    except ImportError:
+        print("streamlit is not installed; skipping first-render timings", file=sys.stderr)
+        return
+    for app in STARTUP_APPS:
+        runs = probe(RENDER_PROBE.format(path=os.path.join(REPO_DIR, app), heavy=HEAVY_MODULES), args.repeat)
+        yield result("startup", f"render/{app}", "first run", probe_stats(runs), heavy_modules=runs[0]["heavy"],
+                     errors=runs[0]["errors"])
+        yield result("startup", f"render/{app}", "rerun", probe_stats(runs, "rerun_seconds"))
+
+
+BENCHMARKS = {
+    "extract": bench_extract,
+    "chunk": bench_chunk,
+    "compress": bench_compress,
+    "chain": bench_chain,
+    "end_to_end": bench_end_to_end,
+    "startup": bench_startup,
+}
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path, tolerance):
+    """Print each result next to the baseline's; returns the number of slowdowns beyond ``tolerance``."""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    previous = {(row["group"], row["name"], row["case"]): row for row in baseline["results"]}
+    print(f"\nCompared with {baseline.get('revision') or baseline_path}:", file=sys.stderr)
+    regressions = 0
+    for row in results:
+        old = previous.get((row["group"], row["name"], row["case"]))
+        if old is None:
+            continue
+        ratio = row["median_seconds"] / max(old["median_seconds"], 1e-9)
+        flag = ""
+        if ratio > 1 + tolerance:
+            regressions += 1
+            flag = "  <-- slower"
+        print(f"{row['group']:<12}{row['name']:<40}{row['case']:<24}{ratio:>7.2f}x{flag}", file=sys.stderr)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark extraction, chunking and summarization offline.")
+    parser.add_argument("-o", "--output", default="-", help="JSON results file, or - for stdout")
+    parser.add_argument("--groups", default=",".join(GROUPS), help=f"comma separated subset of {', '.join(GROUPS)}")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per case")
+    parser.add_argument("--quick", action="store_true", help="smaller inputs, for a fast sanity check")
+    parser.add_argument("--models", default="llama3-70b-8192,deepseek-r1-distill-qwen-32b",
+                        help="models to plan chains for; the first one is used end to end")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="stub LLM seconds per call")
+    parser.add_argument("--llm-tps", type=float, default=0, help="stub LLM output tokens per second, 0 for instant")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="slowdown share reported as a regression")
+    args = parser.parse_args()
+    args.models = args.models.split(",")
+    args.pdf_pages = [10, 50] if args.quick else [10, 100, 500]
+    args.corpus_words = [5000, 20000] if args.quick else [5000, 50000, 200000]
+
+    results = []
+    for group in args.groups.split(","):
+        for row in BENCHMARKS[group](args):
+            results.append(row)
+            throughput = f"{row['throughput']:>10} {row['throughput_unit']}" if "throughput" in row else ""
+            print(f"{row['group']:<12}{row['name']:<40}{row['case']:<24}{row['median_seconds'] * 1000:>10.1f} ms"
+                  f"{row['peak_mb']:>9.1f} MB  {throughput}", file=sys.stderr)
+
+    report = {
+        "revision": git_revision(),
+        "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "settings": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        "results": results,
+    }
+    if args.output == "-":
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare and compare(results, args.compare, args.tolerance):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
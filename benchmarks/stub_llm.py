@@ -0,0 +1,50 @@
+# Offline stand-in for ChatGroq, so benchmarks measure our pipeline rather than the network
+
+import time
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+
+class StubChatModel(BaseChatModel):
+    """Chat model that answers with the first ``output_words`` words of the prompt's content.
+
+    ``latency`` simulates the time to first token and ``tokens_per_second`` the
+    generation speed (0 means instant). The reply is deterministic, so runs are
+    comparable between revisions, and ``calls`` counts every request.
+    """
+
+    latency: float = 0.0
+    tokens_per_second: float = 0.0
+    output_words: int = 120
+    calls: int = 0
+
+    @property
+    def _llm_type(self):
+        return "stub"
+
+    def _reply(self, messages):
+        self.calls += 1
+        # Echo what follows the prompt's "Content:" marker, like a very lazy summarizer
+        content = messages[-1].content.split("Content:", 1)[-1]
+        return " ".join(content.split()[:self.output_words])
+
+    def _token_delay(self):
+        return 1 / self.tokens_per_second if self.tokens_per_second else 0.0
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        reply = self._reply(messages)
+        # About 4 tokens for every 3 words, as in chain_planner.output_budget
+        time.sleep(self.latency + len(reply.split()) * 4 / 3 * self._token_delay())
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=reply))])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        reply = self._reply(messages)
+        time.sleep(self.latency)
+        for word in reply.split():
+            time.sleep(4 / 3 * self._token_delay())
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=word + " "))
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
@@ -0,0 +1,111 @@
+# Pick the summarization strategy that needs the fewest LLM calls for the selected model
+
+import math
+
+from summarization import estimate_tokens
+
+# Context window of each model offered in the UI, in tokens
+MODEL_CONTEXT_WINDOWS = {
+    "deepseek-r1-distill-qwen-32b": 131072,
+    "llama3-70b-8192": 8192,
+    "mixtral-8x7b-32768": 32768,
+}
+DEFAULT_CONTEXT_WINDOW = 8192
+# Reasoning models write their chain of thought before the answer, so leave room for it
+REASONING_TOKENS = {"deepseek-r1-distill-qwen-32b": 2048}
+PROMPT_OVERHEAD_TOKENS = 100
+# Expected size of one chunk summary in the map phase
+MAP_SUMMARY_TOKENS = 400
+# Refine is sequential, so past this many chunks parallel map-reduce finishes sooner
+REFINE_MAX_CHUNKS = 3
+
+STRATEGIES = ("stuff", "map_reduce", "refine")
+
+
+class SummaryPlan:
+    """The chosen strategy with its chunk size and estimated LLM calls and tokens."""
+
+    def __init__(self, strategy, model, input_tokens, chunk_tokens, chunk_count, llm_calls,
+                 estimated_input_tokens, estimated_output_tokens):
+        self.strategy = strategy
+        self.model = model
+        self.input_tokens = input_tokens
+        self.chunk_tokens = chunk_tokens
+        self.chunk_count = chunk_count
+        self.llm_calls = llm_calls
+        self.estimated_input_tokens = estimated_input_tokens
+        self.estimated_output_tokens = estimated_output_tokens
+
+    def as_dict(self):
+        return dict(vars(self))
+
+    def __repr__(self):
+        return f"SummaryPlan({self.strategy}, {self.llm_calls} calls, ~{self.estimated_input_tokens} tokens in)"
+
+
+def output_budget(model, summary_length):
+    # About 4 tokens for every 3 English words, plus headroom for formatting
+    return math.ceil(summary_length * 4 / 3) + 100 + REASONING_TOKENS.get(model, 0)
+
+
+def plan_summary(docs, model, summary_length, strategy=None, max_chunk_tokens=None):
+    """Plan how to summarize ``docs`` with ``model``.
+
+    Without a forced ``strategy`` the content goes in a single "stuff" call when
+    it fits the context window, through "refine" when it needs only a few chunks,
+    and through parallel "map_reduce" otherwise. ``max_chunk_tokens`` caps the
+    chunk size below what the context window allows.
+    """
+    if strategy is not None and strategy not in STRATEGIES:
+        raise ValueError(f"Unknown summarization strategy: {strategy}")
+
+    input_tokens = sum(estimate_tokens(doc.page_content) for doc in docs)
+    output_tokens = output_budget(model, summary_length)
+    context = MODEL_CONTEXT_WINDOWS.get(model, DEFAULT_CONTEXT_WINDOW)
+    chunk_tokens = context - output_tokens - PROMPT_OVERHEAD_TOKENS
+    if max_chunk_tokens:
+        chunk_tokens = min(chunk_tokens, max_chunk_tokens)
+    chunk_count = max(1, math.ceil(input_tokens / chunk_tokens))
+    # Each refine step also carries the running summary, so its chunks are smaller
+    refine_chunk_tokens = chunk_tokens - output_tokens
+    refine_count = max(1, math.ceil(input_tokens / refine_chunk_tokens))
+
+    if strategy is None:
+        if chunk_count == 1:
+            strategy = "stuff"
+        elif refine_count <= REFINE_MAX_CHUNKS:
+            strategy = "refine"
+        else:
+            strategy = "map_reduce"
+
+    if strategy == "stuff":
+        return SummaryPlan(strategy, model, input_tokens, input_tokens, 1, 1,
+                           input_tokens + PROMPT_OVERHEAD_TOKENS, output_tokens)
+
+    if strategy == "refine":
+        # Every step after the first re-reads the running summary alongside the next chunk
+        return SummaryPlan(strategy, model, input_tokens, refine_chunk_tokens, refine_count, refine_count,
+                           input_tokens + refine_count * PROMPT_OVERHEAD_TOKENS + (refine_count - 1) * output_tokens,
+                           refine_count * output_tokens)
+
+    if chunk_count == 1:
+        # Short enough that map-reduce degenerates to the single final call
+        return SummaryPlan(strategy, model, input_tokens, chunk_tokens, 1, 1,
+                           input_tokens + PROMPT_OVERHEAD_TOKENS, output_tokens)
+
+    # map_reduce: one call per chunk, reduce rounds until the summaries fit, then the final call
+    llm_calls = chunk_count
+    estimated_input = input_tokens + chunk_count * PROMPT_OVERHEAD_TOKENS
+    estimated_output = chunk_count * MAP_SUMMARY_TOKENS
+    summaries = chunk_count
+    while summaries > 1 and summaries * MAP_SUMMARY_TOKENS > chunk_tokens:
+        groups = math.ceil(summaries * MAP_SUMMARY_TOKENS / chunk_tokens)
+        llm_calls += groups
+        estimated_input += summaries * MAP_SUMMARY_TOKENS + groups * PROMPT_OVERHEAD_TOKENS
+        estimated_output += groups * MAP_SUMMARY_TOKENS
+        summaries = groups
+    llm_calls += 1
+    estimated_input += summaries * MAP_SUMMARY_TOKENS + PROMPT_OVERHEAD_TOKENS
+    estimated_output += output_tokens
+    return SummaryPlan(strategy, model, input_tokens, chunk_tokens, chunk_count, llm_calls,
+                       estimated_input, estimated_output)
@@ -0,0 +1,60 @@
+# Time-bounded chapters of YouTube transcripts, so long videos are summarized section by section
+
+import os
+
+from summarization import DEFAULT_CHUNK_TOKENS, estimate_tokens
+
+DEFAULT_CHAPTER_SECONDS = int(os.environ.get("CHAPTER_SECONDS", "600"))
+# Videos at least this long get chapter summaries even when the model could take the whole transcript at once
+MIN_CHAPTERED_SECONDS = int(os.environ.get("CHAPTER_MIN_SECONDS", "2700"))
+# A trailing chapter shorter than this share of a full one is folded into the one before it
+MIN_LAST_CHAPTER_SHARE = 0.25
+
+
+def split_chapters(segments, chapter_seconds=DEFAULT_CHAPTER_SECONDS, max_tokens=DEFAULT_CHUNK_TOKENS):
+    """Group transcript segments into chapters of about ``chapter_seconds`` each.
+
+    Returns dicts with ``start`` and ``end`` in seconds and the chapter
+    ``text``. A chapter also closes before it would exceed ``max_tokens``, so
+    fast speech never produces a chapter too big for one LLM call.
+    """
+    chapters, current, current_tokens = [], [], 0
+    for segment in segments:
+        tokens = estimate_tokens(segment["text"])
+        if current and (segment["start"] - current[0]["start"] >= chapter_seconds or current_tokens + tokens > max_tokens):
+            chapters.append(current)
+            current, current_tokens = [], 0
+        current.append(segment)
+        current_tokens += tokens
+    if current:
+        last_seconds = current[-1]["start"] + current[-1]["duration"] - current[0]["start"]
+        if chapters and last_seconds < chapter_seconds * MIN_LAST_CHAPTER_SHARE and \
+                sum(estimate_tokens(segment["text"]) for segment in chapters[-1]) + current_tokens <= max_tokens:
+            chapters[-1].extend(current)
+        else:
+            chapters.append(current)
+    return [
+        {
+            "start": chapter[0]["start"],
+            "end": chapter[-1]["start"] + chapter[-1]["duration"],
+            "text": " ".join(segment["text"] for segment in chapter),
+        }
+        for chapter in chapters
+    ]
+
+
+def format_timestamp(seconds):
+    """Format ``seconds`` the way YouTube does: 4:05, or 1:02:05 past the hour."""
+    hours, rest = divmod(int(seconds), 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+
+def timestamp_url(video_id, seconds):
+    """Link to ``video_id`` playing from ``seconds``."""
+    return f"https://www.youtube.com/watch?v={video_id}&t={int(seconds)}s"
+
+
+def format_chapters(chapters):
+    """Render chapter summaries as a Markdown list, each entry linking to its point in the video."""
+    return "\n".join(f"- [{chapter['timestamp']}]({chapter['url']}) {chapter['summary']}" for chapter in chapters)
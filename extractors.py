@@ -0,0 +1,157 @@
+# Source extraction shared by the Streamlit apps and the batch CLI; each loader imports only what its source type needs
+
+import os
+import re
+from urllib.parse import parse_qs, urlsplit
+
+import validators
+
+from chapters import split_chapters
+from pdf_extraction import extract_pdf_text, source_size
+from pipeline_events import PipelineTracker, STAGE_PROGRESS
+from html_extraction import parse_document, parse_html
+from source_cache import fetch_page, fetch_transcript
+from summarization import estimate_tokens
+
+
+# Hosts, with any subdomain (www., m., music.), that serve YouTube videos
+YOUTUBE_HOSTS = ("youtube.com", "youtu.be", "youtube-nocookie.com")
+
+
+def _split_url(url):
+    # Accept URLs typed without a scheme, like youtu.be/ID
+    url = url.strip()
+    return urlsplit(url if "//" in url else "https://" + url)
+
+
+def _host(parts):
+    return (parts.hostname or "").lower()
+
+
+def is_youtube_url(url):
+    """True if ``url``'s host is YouTube's, whatever the subdomain or scheme."""
+    host = _host(_split_url(url))
+    return any(host == name or host.endswith("." + name) for name in YOUTUBE_HOSTS)
+
+
+def detect_source_type(source):
+    """Return "youtube", "website" or "pdf" for ``source``, or None if it is none of them."""
+    if is_youtube_url(source):
+        return "youtube"
+    if validators.url(source):
+        return "website"
+    if source.lower().endswith(".pdf") and os.path.isfile(source):
+        return "pdf"
+    return None
+
+
+VIDEO_ID = re.compile(r"[A-Za-z0-9_-]{11}")
+# youtube.com paths that carry the video ID as their second segment
+VIDEO_PATH_PREFIXES = ("embed", "shorts", "live", "v", "e")
+
+
+def extract_video_id(url):
+    """Return the 11-character video ID of any YouTube URL form.
+
+    Handles youtu.be/ID, watch?v=ID (with ``v`` anywhere in the query),
+    /embed/, /shorts/ and /live/ paths, m., music. and nocookie hosts, and
+    URLs without a scheme.
+    """
+    parts = _split_url(url)
+    host = _host(parts)
+    segments = [segment for segment in parts.path.split("/") if segment]
+    candidate = None
+    if host == "youtu.be" or host.endswith(".youtu.be"):
+        candidate = segments[0] if segments else None
+    elif not segments or segments[0] == "watch":
+        candidate = parse_qs(parts.query).get("v", [None])[0]
+    elif segments[0] in VIDEO_PATH_PREFIXES and len(segments) > 1:
+        candidate = segments[1]
+    if candidate is None or not VIDEO_ID.fullmatch(candidate):
+        raise ValueError(f"Could not find a YouTube video ID in {url}")
+    return candidate
+
+
+def load_youtube_docs(url, source_cache=None, tracker=None):
+    """Fetch the transcript of a YouTube video; returns ``(docs, source_info)``.
+
+    Long videos come back as one document per chapter (see
+    chapters.split_chapters), with ``video_id``, ``start`` and ``end`` in the
+    metadata, so each can be summarized on its own and linked back to.
+    """
+    from langchain.schema import Document
+
+    tracker = tracker or PipelineTracker()
+    video_id = extract_video_id(url)
+    get_transcript = source_cache.get_transcript if source_cache else fetch_transcript
+
+    with tracker.stage("fetch", "transcript") as record:
+        transcript_list, language = get_transcript(video_id)
+        record.bytes = sum(len(item['text'].encode("utf-8")) for item in transcript_list)
+    if language.split("-")[0] == "en":
+        source_info = f"YouTube Video (ID: {video_id})"
+    else:
+        source_info = f"YouTube Video (ID: {video_id}, Language: {language})"
+
+    with tracker.stage("extract", "transcript") as record:
+        chapters = split_chapters(transcript_list)
+        record.tokens = sum(estimate_tokens(chapter["text"]) for chapter in chapters)
+
+    docs = [
+        Document(page_content=chapter["text"],
+                 metadata={"source": url, "video_id": video_id, "start": chapter["start"], "end": chapter["end"]})
+        for chapter in chapters
+    ]
+    return docs, source_info
+
+
+def load_website_docs(url, source_cache=None, tracker=None):
+    """Download and partition a web page; returns ``(docs, source_info)``."""
+    from langchain.schema import Document
+
+    tracker = tracker or PipelineTracker()
+    # Download and extract the page text, or revalidate the cached text
+    with tracker.stage("fetch", "website") as record:
+        if source_cache:
+            page_text = source_cache.get_page_text(url)
+        else:
+            body = fetch_page(url)[1]
+            page_text = parse_html(body) if isinstance(body, str) else parse_document(body)
+        record.bytes = len(page_text.encode("utf-8"))
+        record.tokens = estimate_tokens(page_text)
+
+    return [Document(page_content=page_text, metadata={"source": url})], f"Website: {url}"
+
+
+def load_pdf_docs(pdf, name, page_spec=None, tracker=None):
+    """Extract text from a PDF path or upload; returns ``(docs, source_info)``."""
+    from langchain.schema import Document
+
+    tracker = tracker or PipelineTracker()
+
+    def on_progress(done, total):
+        # Spread page progress over the fetch -> extract span of the progress bar
+        start, end = STAGE_PROGRESS["fetch"], STAGE_PROGRESS["extract"]
+        tracker.progress(start + (end - start) * done / total, f"Processing PDF page {done}/{total}")
+
+    with tracker.stage("extract", "pdf") as record:
+        pdf_text = extract_pdf_text(pdf, page_spec=page_spec, on_progress=on_progress)
+        record.bytes = source_size(pdf)
+        record.tokens = estimate_tokens(pdf_text)
+
+    return [Document(page_content=pdf_text, metadata={"source": name})], f"PDF: {name}"
+
+
+def load_source_docs(source, source_cache=None, tracker=None, page_spec=None):
+    """Dispatch a URL, PDF path or uploaded PDF to the matching loader; returns ``(docs, source_info)``."""
+    if hasattr(source, "read"):
+        # An uploaded file object, e.g. Streamlit's UploadedFile
+        return load_pdf_docs(source, source.name, page_spec, tracker)
+    source_type = detect_source_type(source)
+    if source_type == "youtube":
+        return load_youtube_docs(source, source_cache, tracker)
+    if source_type == "website":
+        return load_website_docs(source, source_cache, tracker)
+    if source_type == "pdf":
+        return load_pdf_docs(source, os.path.basename(source), page_spec, tracker)
+    raise ValueError(f"Not a YouTube URL, website URL or PDF path: {source}")
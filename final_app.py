@@ -2,15 +2,19 @@
 
 import validators
 import streamlit as st
-from langchain.prompts import PromptTemplate
-from langchain_groq import ChatGroq
-from langchain.chains.summarize import load_summarize_chain
-from langchain_community.document_loaders import UnstructuredURLLoader
-from langchain.schema import Document
-from youtube_transcript_api import YouTubeTranscriptApi
-import os
-import fitz
-import time
+import io
+import uuid
+# Only light modules here: LangChain, PyMuPDF, unstructured and the transcript API
+# load on first use, so the page renders before any of them is imported
+from summary_cache import SummaryCache
+from source_cache import SourceCache
+from llm_clients import get_llm
+from pipeline_events import PipelineTracker
+from job_queue import JobQueue
+from pipeline import summarize_source
+from single_flight import SingleFlight
+from chapters import format_chapters
+from extractors import is_youtube_url
 
 # App theme and configuration
 st.set_page_config(
@@ -20,6 +24,100 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Summarization Mode choices and the planner strategy each one forces (None lets the planner decide)
+SUMMARIZATION_STRATEGIES = {
+    "Auto": None,
+    "Single pass": "stuff",
+    "Refine": "refine",
+    "Map-reduce": "map_reduce",
+}
+
+# Identifies this browser session's background jobs across reruns
+st.session_state.setdefault("user_id", uuid.uuid4().hex)
+
+@st.cache_resource
+def get_job_queue():
+    # Worker pool shared by every session of this server process
+    return JobQueue()
+
+@st.cache_resource
+def get_summary_cache():
+    # One cache handle per server process; the data itself lives on disk
+    return SummaryCache()
+
+@st.cache_resource
+def get_near_duplicates():
+    # Fingerprints of summarized text, shared on disk next to the summary cache
+    from near_duplicates import NearDuplicateIndex
+
+    return NearDuplicateIndex()
+
+@st.cache_resource
+def get_source_cache():
+    # Fetched transcripts and page text, shared by every session on disk
+    return SourceCache()
+
+@st.cache_resource
+def get_single_flight():
+    # Coalesces identical requests across all sessions of this server process
+    return SingleFlight()
+
+def make_llm(api_key, model, fallback):
+    # Reuse this key's clients, with their open connections
+    if fallback:
+        from model_router import routed_llm
+
+        return routed_llm(api_key, model)
+    return get_llm(api_key, model)
+
+def summary_text(result):
+    # Downloads carry the chapter list too, with its links back into the video
+    if not result.get("chapters"):
+        return result["summary"]
+    return f"{result['summary']}\n\nChapters:\n{format_chapters(result['chapters'])}"
+
+def render_chapters(chapters):
+    st.markdown("#### 🎬 Chapters")
+    st.markdown(format_chapters(chapters))
+
+def render_progress(placeholder, percent, label):
+    placeholder.markdown(f"""
+    <div class="progress-bar">
+        <div class="progress-value" style="width:{percent}%"></div>
+    </div>
+    <p class="source-tag">{label} ({percent}%)</p>
+    """, unsafe_allow_html=True)
+
+def render_background_jobs(user_id, polling):
+    job_queue = get_job_queue()
+    status_icons = {"queued": "⏳", "running": "⚙️", "done": "✅", "failed": "❌"}
+    for job in job_queue.jobs_for(user_id):
+        with st.expander(f"{status_icons[job['status']]} {job['title']} — {job['status']}", expanded=job["status"] == "done"):
+            if job["status"] == "done":
+                result = job["result"]
+                st.markdown(f'<div class="success-box">{result["summary"]}</div>', unsafe_allow_html=True)
+                st.markdown(f'<p class="source-tag">Source: {result["source_info"]}</p>', unsafe_allow_html=True)
+                if result.get("chapters"):
+                    render_chapters(result["chapters"])
+                if result.get("near_duplicate"):
+                    st.caption(f"♻️ Reused the summary of near-identical content ({result['near_duplicate']:.0%} similar)")
+                if result.get("answered_by"):
+                    st.caption(f"🔀 The selected model was unavailable or slow, so this summary was written with: {', '.join(result['answered_by'])}")
+                st.download_button(
+                    label="📥 Download Summary",
+                    data=summary_text(result),
+                    file_name="content_summary.txt",
+                    mime="text/plain",
+                    key=f"download-{job['id']}"
+                )
+            elif job["status"] == "failed":
+                st.error(f"❌ Error: {job['error'].splitlines()[0]}")
+            else:
+                st.caption("Working on it — you can keep using the app.")
+    # Stop polling with a full rerun once everything has finished
+    if polling and not job_queue.has_active_jobs(user_id):
+        st.rerun()
+
 image_path = r"c:\Users\shashank.srivastava\Downloads\image-removebg-preview (2).png"
 # Custom CSS
 st.markdown("""
@@ -89,11 +187,9 @@ with st.sidebar:
     st.caption("Powered by LangChain & Groq")
     st.markdown("### Configuration")
     
+    # Kept in this session only and passed to the client explicitly, never set process-wide
     groq_api_key = st.text_input("Groq API Key", value="", type="password", help="Enter your Groq API key to enable summarization")
     
-    if groq_api_key:
-        os.environ["GROQ_API_KEY"] = groq_api_key
-    
     st.markdown("### Advanced Settings")
     model_selection = st.selectbox(
         "Select AI Model",
@@ -102,6 +198,12 @@ with st.sidebar:
         help="Choose the AI model for summarization"
     )
     
+    model_fallback = st.checkbox(
+        "Fall back to other models",
+        value=True,
+        help="Retry rate-limited calls, and race a second model when the selected one is slower than usual"
+    )
+    
     summary_length = st.slider(
         "Summary Length (words)",
         min_value=100,
@@ -111,6 +213,28 @@ with st.sidebar:
         help="Adjust the length of your summary"
     )
     
+    summarization_mode = st.selectbox(
+        "Summarization Mode",
+        list(SUMMARIZATION_STRATEGIES),
+        index=0,
+        help="Auto picks the fewest LLM calls that fit the model's context window. Map-reduce splits long content into chunks that are summarized in parallel and then merged"
+    )
+    
+    precompress = st.checkbox(
+        "Pre-compress long content",
+        value=False,
+        help="Keep only the most salient sentences of long content before it is sent to the model"
+    )
+    
+    compression_ratio = st.slider(
+        "Share of content to keep",
+        min_value=0.1,
+        max_value=0.9,
+        value=0.35,
+        step=0.05,
+        disabled=not precompress
+    )
+    
     st.markdown("### About")
     st.info("This app uses AI to summarize content from multiple sources. Upload a PDF or provide a URL to get started.")
 
@@ -134,7 +258,7 @@ with tab1:
         # Auto-detect source type
         source_type = None
         if generic_url:
-            if "youtube.com" in generic_url or "youtu.be" in generic_url:
+            if is_youtube_url(generic_url):
                 st.success("✅ YouTube video detected")
                 source_type = "youtube"
             elif validators.url(generic_url):
@@ -150,6 +274,11 @@ with tab1:
         if pdf_file:
             st.success(f"✅ PDF uploaded: {pdf_file.name}")
             source_type = "pdf"
+            pdf_pages = st.text_input(
+                "Pages to summarize",
+                placeholder="All pages, or e.g. 1-10, 15, 20-",
+                help="Limit extraction to these page ranges (1-based, inclusive)"
+            )
     
     # Summary options
     st.markdown("### 🔍 Summary Options")
@@ -165,143 +294,145 @@ with tab1:
     with col2:
         include_metadata = st.checkbox("Include source metadata", value=True)
     
-    # Action button
-    summarize_button = st.button("✨ Generate Summary", use_container_width=True)
+    # Action buttons
+    col1, col2 = st.columns([3, 1])
     
-    # Processing logic
-    if summarize_button:
-        # Validate inputs
+    with col1:
+        summarize_button = st.button("✨ Generate Summary", use_container_width=True)
+    
+    with col2:
+        queue_button = st.button(
+            "🕒 Queue in Background",
+            use_container_width=True,
+            help="Summarize this source in the background and keep using the app"
+        )
+    
+    def run_options():
+        # The settings tab is rendered after this one, so read its value from session state
+        use_cache = st.session_state.get("cache_results", True)
+        return dict(
+            strategy=SUMMARIZATION_STRATEGIES[summarization_mode],
+            compress_ratio=compression_ratio if precompress else None,
+            page_spec=pdf_pages if source_type == "pdf" else None,
+            source_cache=get_source_cache() if use_cache else None,
+            summary_cache=get_summary_cache() if use_cache else None,
+            near_duplicates=get_near_duplicates() if use_cache else None,
+            # Identical requests made with the same key share one run instead of starting their own
+            single_flight=get_single_flight(),
+            api_key=groq_api_key,
+        )
+    
+    if queue_button:
         if not groq_api_key.strip():
             st.error("⚠️ Please provide a Groq API key in the sidebar")
         elif not source_type:
             st.error("⚠️ Please provide a valid URL or upload a PDF file")
+        else:
+            if source_type == "pdf":
+                # Copy the upload so the job doesn't depend on the widget's state
+                source = io.BytesIO(pdf_file.getvalue())
+                source.name = pdf_file.name
+                title = pdf_file.name
+            else:
+                source = title = generic_url
+            get_job_queue().submit(
+                st.session_state["user_id"],
+                title,
+                summarize_source,
+                source,
+                make_llm(groq_api_key, model_selection, model_fallback),
+                model_selection,
+                summary_style,
+                summary_length,
+                **run_options(),
+            )
+            st.toast(f"🕒 Queued: {title}")
+    
+    # Processing logic
+    if summarize_button:
+        progress_placeholder = st.empty()
+        tracker = PipelineTracker(on_progress=lambda percent, label: render_progress(progress_placeholder, percent, label))
+
+        # Validate inputs
+        with tracker.stage("validate"):
+            validation_error = None
+            if not groq_api_key.strip():
+                validation_error = "⚠️ Please provide a Groq API key in the sidebar"
+            elif not source_type:
+                validation_error = "⚠️ Please provide a valid URL or upload a PDF file"
+
+        if validation_error:
+            progress_placeholder.empty()
+            st.error(validation_error)
         else:
             try:
-                # Show processing animation
                 with st.spinner("Processing your content..."):
-                    progress_placeholder = st.empty()
-                    # Simulate progress
-                    for i in range(101):
-                        progress_placeholder.markdown(f"""
-                        <div class="progress-bar">
-                            <div class="progress-value" style="width:{i}%"></div>
-                        </div>
-                        <p class="source-tag">Processing {i}%</p>
-                        """, unsafe_allow_html=True)
-                        time.sleep(0.01)
-                
-                    # Initialize the language model
-                    llm = ChatGroq(
-                        model=model_selection,
-                        api_key=groq_api_key
+                    result_placeholder = st.empty()
+
+                    def render_result(text):
+                        result_placeholder.markdown(f'### 📋 Summary Result\n\n<div class="success-box">{text}</div>', unsafe_allow_html=True)
+
+                    # Tokens are written into the result box as they arrive
+                    result = summarize_source(
+                        pdf_file if source_type == "pdf" else generic_url,
+                        make_llm(groq_api_key, model_selection, model_fallback),
+                        model_selection,
+                        summary_style,
+                        summary_length,
+                        tracker=tracker,
+                        on_partial_summary=render_result,
+                        **run_options(),
                     )
-                    
-                    # Adjust the prompt based on selected style
-                    prompt_template = ""
-                    if summary_style == "Concise":
-                        prompt_template = f"""
-                        Provide a concise summary of the following content in {summary_length} words:
-                        Content: {{text}}
-                        """
-                    elif summary_style == "Detailed":
-                        prompt_template = f"""
-                        Provide a detailed analysis and summary of the following content in {summary_length} words,
-                        highlighting the key points, main arguments, and important details:
-                        Content: {{text}}
-                        """
-                    else:  # Bullet Points
-                        prompt_template = f"""
-                        Summarize the following content in {summary_length} words using bullet points for clarity.
-                        Focus on the most important information and organize it logically:
-                        Content: {{text}}
-                        """
-                    
-                    prompt = PromptTemplate(template=prompt_template, input_variables=["text"])
-                    docs = []
-                    source_info = ""
-
-                    # Handle YouTube videos
-                    if source_type == "youtube":                    
-                        # Extract video ID from URL
-                        if "youtu.be" in generic_url:
-                            video_id = generic_url.split("/")[-1].split("?")[0]
-                        else:
-                            video_id = generic_url.split("v=")[1].split("&")[0]
+                    output_summary, source_info = result["summary"], result["source_info"]
+                    if tracker.notes.get("shared_in_flight"):
+                        st.toast("♻️ The same summary was already being generated, so this one shares its result")
+                    if result["near_duplicate"]:
+                        st.info(f"♻️ Reused the summary of near-identical content ({result['near_duplicate']:.0%} similar)")
+                    if result["answered_by"]:
+                        st.info(f"🔀 {model_selection} was unavailable or slow, so this summary was written with: {', '.join(result['answered_by'])}")
+
+                    # Display the result with styling
+                    with tracker.stage("render") as record:
+                        render_result(output_summary)
+                        record.bytes = len(output_summary.encode("utf-8"))
+                        if result["chapters"]:
+                            render_chapters(result["chapters"])
                         
-                        # Try to get transcript
-                        try:
-                            transcript_list = YouTubeTranscriptApi.get_transcript(video_id, languages=['en'])
-                            transcript_text = " ".join([item['text'] for item in transcript_list])
-                            source_info = f"YouTube Video (ID: {video_id})"
-                        except:
-                            # If English isn't available, try any transcript
-                            transcript_list = YouTubeTranscriptApi.get_transcript(video_id)
-                            transcript_text = " ".join([item['text'] for item in transcript_list])
-                            source_info = f"YouTube Video (ID: {video_id}, Non-English)"
+                        if include_metadata:
+                            st.markdown(f'<p class="source-tag">Source: {source_info}</p>', unsafe_allow_html=True)
                         
-                        docs = [Document(page_content=transcript_text, metadata={"source": generic_url})]
-                    
-                    # Handle websites
-                    elif source_type == "website":
-                        loader = UnstructuredURLLoader(
-                            urls=[generic_url], 
-                            ssl_verify=False,
-                            headers={"User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 13_5_1) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/116.0.0.0 Safari/537.36"}
+                        # Add download button for the summary
+                        st.download_button(
+                            label="📥 Download Summary",
+                            data=summary_text(result),
+                            file_name="content_summary.txt",
+                            mime="text/plain"
                         )
-                        docs = loader.load()
-                        source_info = f"Website: {generic_url}"
-                    
-                    # Handle PDFs
-                    elif source_type == "pdf":
-                        pdf_text = ""
-                        with fitz.open(stream=pdf_file.read(), filetype="pdf") as doc:
-                            page_count = len(doc)
-                            for page_num, page in enumerate(doc):
-                                pdf_text += page.get_text()
-                                # Update progress
-                                progress = int((page_num + 1) / page_count * 100)
-                                progress_placeholder.markdown(f"""
-                                <div class="progress-bar">
-                                    <div class="progress-value" style="width:{progress}%"></div>
-                                </div>
-                                <p class="source-tag">Processing PDF page {page_num + 1}/{page_count}</p>
-                                """, unsafe_allow_html=True)
-                        
-                        docs = [Document(page_content=pdf_text, metadata={"source": pdf_file.name})]
-                        source_info = f"PDF: {pdf_file.name}"
-
-                    # Process the content if documents were obtained
-                    if docs:
-                        chain = load_summarize_chain(llm, chain_type="stuff", prompt=prompt)
-                        
-                        with st.spinner("📝 Generating your summary..."):
-                            output_summary = chain.invoke(docs)
-                            
-                            # Handle the output format
-                            if isinstance(output_summary, dict) and "output_text" in output_summary:
-                                output_summary = output_summary["output_text"]
-                            
-                            # Display the result with styling
-                            st.markdown("### 📋 Summary Result")
-                            st.markdown(f'<div class="success-box">{output_summary}</div>', unsafe_allow_html=True)
-                            
-                            if include_metadata:
-                                st.markdown(f'<p class="source-tag">Source: {source_info}</p>', unsafe_allow_html=True)
-                            
-                            # Add download button for the summary
-                            st.download_button(
-                                label="📥 Download Summary",
-                                data=output_summary,
-                                file_name="content_summary.txt",
-                                mime="text/plain"
-                            )
-                    else:
-                        st.error("❌ No content could be extracted from the provided source.")
                         
             except Exception as e:
                 st.error(f"❌ Error: {str(e)}")
                 st.info("If you're having issues with YouTube videos, check if captions are available for this video.")
 
+            # The settings tab is rendered after this one, so read its value from session state
+            if st.session_state.get("debug_mode", False):
+                with st.expander("⏱️ Stage timings", expanded=True):
+                    st.table(tracker.breakdown())
+                    st.caption(f"Total pipeline time: {tracker.total_seconds():.2f}s")
+                    if tracker.notes:
+                        st.json(tracker.notes)
+                    if model_fallback:
+                        from model_router import model_stats
+
+                        st.caption("Recent calls per model")
+                        st.json(model_stats())
+
+    # Background jobs survive reruns; poll for updates while any are still queued or running
+    user_id = st.session_state["user_id"]
+    if get_job_queue().jobs_for(user_id, limit=1):
+        st.markdown("### 🕒 Background Jobs")
+        polling = get_job_queue().has_active_jobs(user_id)
+        st.fragment(render_background_jobs, run_every=2 if polling else None)(user_id, polling)
+
 with tab2:
     st.markdown("### How Content Summarizer Pro Works")
     
@@ -364,10 +495,10 @@ with tab3:
     col1, col2 = st.columns(2)
     
     with col1:
-        cache_results = st.checkbox("Cache results to improve performance", value=True)
+        cache_results = st.checkbox("Cache results to improve performance", value=True, key="cache_results")
     
     with col2:
-        debug_mode = st.checkbox("Enable debug mode", value=False)
+        debug_mode = st.checkbox("Enable debug mode", value=False, key="debug_mode")
     
     st.button("Save Settings", type="primary", use_container_width=True)
 
@@ -0,0 +1,147 @@
+# Fast main-text extraction for ordinary article pages, with unstructured as the fallback
+
+import re
+from html.parser import HTMLParser
+
+# The fast path has to produce at least this much text before we trust it over unstructured
+FAST_PATH_MIN_CHARS = 500
+FEED_CHUNK_CHARS = 64 * 1024
+
+SKIP_TAGS = {
+    "head", "script", "style", "noscript", "template", "svg", "canvas", "iframe",
+    "nav", "aside", "form", "button", "select", "dialog",
+}
+# Site chrome around the page, but an article's own headline and byline inside <article>/<main>
+PAGE_CHROME_TAGS = {"header", "footer"}
+BLOCK_TAGS = {
+    "p", "div", "section", "article", "main", "header", "footer", "blockquote", "pre", "ul", "ol", "li",
+    "dl", "dt", "dd", "table", "tr", "figcaption", "h1", "h2", "h3", "h4", "h5", "h6",
+}
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "param", "source", "track", "wbr"}
+CONTENT_TAGS = {"article", "main"}
+# Containers that are never boilerplate even if their class says "has-sidebar" or similar
+NEVER_SKIP_TAGS = {"html", "body", "article", "main"}
+
+BOILERPLATE_ROLES = {"navigation", "banner", "contentinfo", "complementary", "search", "dialog"}
+# Matched against each class / id token, e.g. "site-footer", "share-bar", "cookie-banner", "comments"
+BOILERPLATE_PATTERN = re.compile(
+    r"^(?:(?:site|main|global|page|top|bottom|primary|secondary|cookie)[-_])?"
+    r"(?:nav|navbar|navigation|menu|footer|sidebar|breadcrumbs?|cookie|consent|banner|advert|ads?|promo|"
+    r"share|social|related|comments?|newsletter|subscribe|popup|modal)(?:[-_].*)?$",
+    re.IGNORECASE,
+)
+BLOCK_BREAK = "\x00"
+
+
+def _is_boilerplate(tag, attrs):
+    if tag in NEVER_SKIP_TAGS:
+        return False
+    if (attrs.get("role") or "").lower() in BOILERPLATE_ROLES or "hidden" in attrs:
+        return True
+    tokens = f"{attrs.get('class') or ''} {attrs.get('id') or ''}".split()
+    return any(BOILERPLATE_PATTERN.match(token) for token in tokens)
+
+
+class _MainTextParser(HTMLParser):
+    """Collects visible text, skipping boilerplate subtrees, and keeps article/main text apart."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.skip_stack = []
+        # (tag, is_content) for every open element outside boilerplate
+        self.open_stack = []
+        self.content_depth = 0
+        self.body_parts = []
+        self.content_parts = []
+
+    def _append(self, text):
+        self.body_parts.append(text)
+        if self.content_depth:
+            self.content_parts.append(text)
+
+    def handle_starttag(self, tag, attrs):
+        if tag in VOID_TAGS:
+            if tag == "br" and not self.skip_stack:
+                self._append(BLOCK_BREAK)
+            return
+        attrs = dict(attrs)
+        if (self.skip_stack or tag in SKIP_TAGS or (tag in PAGE_CHROME_TAGS and not self.content_depth)
+                or _is_boilerplate(tag, attrs)):
+            # Remember every open tag inside boilerplate so we know where it ends
+            self.skip_stack.append(tag)
+            return
+        is_content = tag in CONTENT_TAGS or (attrs.get("role") or "").lower() == "main"
+        self.open_stack.append((tag, is_content))
+        if is_content:
+            self.content_depth += 1
+        if tag in BLOCK_TAGS:
+            self._append(BLOCK_BREAK)
+
+    def handle_endtag(self, tag):
+        if self.skip_stack:
+            if tag in self.skip_stack:
+                # Pop up to the matching tag; tolerates unclosed <li>, <p> and friends
+                while self.skip_stack.pop() != tag:
+                    pass
+            return
+        if tag in BLOCK_TAGS:
+            self._append(BLOCK_BREAK)
+        if any(open_tag == tag for open_tag, _ in self.open_stack):
+            while True:
+                open_tag, is_content = self.open_stack.pop()
+                if is_content:
+                    self.content_depth -= 1
+                if open_tag == tag:
+                    break
+
+    def handle_data(self, data):
+        if not self.skip_stack:
+            self._append(data)
+
+
+def _normalize(parts):
+    blocks = (" ".join(block.split()) for block in "".join(parts).split(BLOCK_BREAK))
+    return "\n\n".join(block for block in blocks if block)
+
+
+def extract_main_text(html):
+    """Return the main article text of ``html`` using the stdlib streaming parser.
+
+    Navigation, page headers and footers, scripts and similar boilerplate are
+    dropped; a header or footer inside <article>/<main> is kept unless its
+    role or class marks it as boilerplate.
+    Text inside <article>/<main> wins when the page has enough of it.
+    """
+    parser = _MainTextParser()
+    for start in range(0, len(html), FEED_CHUNK_CHARS):
+        parser.feed(html[start:start + FEED_CHUNK_CHARS])
+    parser.close()
+
+    content_text = _normalize(parser.content_parts)
+    if len(content_text) >= FAST_PATH_MIN_CHARS:
+        return content_text
+    return _normalize(parser.body_parts)
+
+
+def parse_with_unstructured(html):
+    """Partition raw HTML with unstructured, the same way UnstructuredURLLoader does."""
+    from unstructured.partition.html import partition_html
+
+    return "\n\n".join(str(element) for element in partition_html(text=html))
+
+
+def parse_document(content):
+    """Partition a downloaded non-HTML file (PDF, Word, plain text, ...) with unstructured's type detection."""
+    import io
+
+    from unstructured.partition.auto import partition
+
+    return "\n\n".join(str(element) for element in partition(file=io.BytesIO(content)))
+
+
+def parse_html(html):
+    """Extract page text with the fast path, falling back to unstructured when it finds too little."""
+    text = extract_main_text(html)
+    if len(text) >= FAST_PATH_MIN_CHARS:
+        return text
+    return parse_with_unstructured(html)
@@ -0,0 +1,163 @@
+# Background job executor so long summaries don't block the Streamlit script thread
+
+import json
+import os
+import socket
+import threading
+import time
+import traceback
+import uuid
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlite_connections import ThreadLocalConnections
+
+DEFAULT_JOB_DIR = os.path.join(os.path.expanduser("~"), ".cache", "content-summarizer")
+DEFAULT_MAX_WORKERS = int(os.environ.get("JOB_MAX_WORKERS", "8"))
+DEFAULT_PER_USER_LIMIT = int(os.environ.get("JOB_PER_USER_LIMIT", "2"))
+# Finished jobs, with their results, are deleted this long after they last changed
+DEFAULT_RETENTION_SECONDS = int(os.environ.get("JOB_RETENTION_SECONDS", str(7 * 24 * 60 * 60)))
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+JOB_COLUMNS = "id, user_id, title, status, result, error, created_at, updated_at"
+
+
+def _process_alive(pid):
+    if pid == os.getpid():
+        return False  # our own jobs from before this queue was created are gone with the old pool
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class JobQueue:
+    """Runs jobs on a worker pool and persists their status and results in SQLite.
+
+    Each user has at most ``per_user_limit`` jobs running at once; the rest wait
+    in that user's queue, so one user queueing twenty sources can't starve the others.
+    Job functions must not call Streamlit; they return a JSON-serializable result.
+    Finished jobs older than ``retention_seconds`` are pruned when the queue
+    starts and whenever a job is submitted.
+    """
+
+    def __init__(self, job_dir=None, max_workers=DEFAULT_MAX_WORKERS, per_user_limit=DEFAULT_PER_USER_LIMIT,
+                 retention_seconds=DEFAULT_RETENTION_SECONDS):
+        job_dir = job_dir or os.environ.get("JOB_DIR", DEFAULT_JOB_DIR)
+        os.makedirs(job_dir, exist_ok=True)
+        self.path = os.path.join(job_dir, "jobs.sqlite3")
+        self.per_user_limit = per_user_limit
+        self.retention_seconds = retention_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="summary-job")
+        self._lock = threading.Lock()
+        self._db = ThreadLocalConnections(self.path)
+        self._waiting = defaultdict(deque)
+        self._running = defaultdict(int)
+        with self._db.connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    user_id TEXT NOT NULL,
+                    title TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    owner TEXT NOT NULL,
+                    result TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_user ON jobs (user_id, created_at)")
+        self._fail_orphaned_jobs()
+        with self._db.connect() as conn:
+            self._prune(conn, time.time())
+
+    def _fail_orphaned_jobs(self):
+        # Unfinished jobs of a server process on this host that has since exited will never complete
+        host = socket.gethostname()
+        with self._db.connect() as conn:
+            rows = conn.execute(
+                "SELECT id, owner FROM jobs WHERE status IN (?, ?) AND owner LIKE ?", (QUEUED, RUNNING, f"{host}:%")
+            ).fetchall()
+            orphaned = [(job_id,) for job_id, owner in rows if not _process_alive(int(owner.rsplit(":", 1)[1]))]
+            conn.executemany(
+                f"UPDATE jobs SET status = '{FAILED}', error = 'Interrupted by a server restart' WHERE id = ?",
+                orphaned,
+            )
+
+    def _prune(self, conn, now):
+        conn.execute(
+            "DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?", (DONE, FAILED, now - self.retention_seconds)
+        )
+
+    def _update(self, job_id, status, result=None, error=None):
+        with self._db.connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, updated_at = ? WHERE id = ?",
+                (status, None if result is None else json.dumps(result), error, time.time(), job_id),
+            )
+
+    def submit(self, user_id, title, func, *args, **kwargs):
+        """Queue ``func(*args, **kwargs)`` for ``user_id`` and return the new job ID."""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._db.connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, user_id, title, status, owner, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, user_id, title, QUEUED, self.owner, now, now),
+            )
+            self._prune(conn, now)
+        with self._lock:
+            self._waiting[user_id].append((job_id, func, args, kwargs))
+            self._dispatch(user_id)
+        return job_id
+
+    def _dispatch(self, user_id):
+        # Called with the lock held: start waiting jobs while the user is under the limit
+        while self._waiting[user_id] and self._running[user_id] < self.per_user_limit:
+            job = self._waiting[user_id].popleft()
+            self._running[user_id] += 1
+            self._pool.submit(self._run, user_id, *job)
+
+    def _run(self, user_id, job_id, func, args, kwargs):
+        self._update(job_id, RUNNING)
+        try:
+            self._update(job_id, DONE, result=func(*args, **kwargs))
+        except Exception as e:
+            self._update(job_id, FAILED, error=f"{e}\n\n{traceback.format_exc(limit=5)}")
+        finally:
+            with self._lock:
+                self._running[user_id] -= 1
+                self._dispatch(user_id)
+
+    def _row_to_job(self, row):
+        job_id, user_id, title, status, result, error, created_at, updated_at = row
+        return {
+            "id": job_id,
+            "user_id": user_id,
+            "title": title,
+            "status": status,
+            "result": json.loads(result) if result else None,
+            "error": error,
+            "created_at": created_at,
+            "updated_at": updated_at,
+        }
+
+    def jobs_for(self, user_id, limit=20):
+        """Return the user's most recent jobs, newest first."""
+        rows = self._db.connect().execute(
+            f"SELECT {JOB_COLUMNS} FROM jobs WHERE user_id = ? ORDER BY created_at DESC LIMIT ?", (user_id, limit)
+        ).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    def has_active_jobs(self, user_id):
+        row = self._db.connect().execute(
+            "SELECT 1 FROM jobs WHERE user_id = ? AND status IN (?, ?) LIMIT 1", (user_id, QUEUED, RUNNING)
+        ).fetchone()
+        return row is not None
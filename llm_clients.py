@@ -0,0 +1,83 @@
+# Reused Groq clients, so each request skips client construction and TLS handshakes
+
+import contextvars
+import hashlib
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+DEFAULT_MAX_CLIENTS = 64
+
+# Set of model names collected by answering_models in the current context, if any
+_answering = contextvars.ContextVar("answering_models", default=None)
+
+
+def key_hash(api_key):
+    # Registry keys never hold the raw API key
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+
+
+class ClientRegistry:
+    """Keeps one ChatGroq per (API key, model) and hands it to every request using that pair.
+
+    Each client owns an HTTP connection pool, so reusing it keeps connections
+    to Groq alive between requests. The key is always passed to the client
+    explicitly; nothing is read from or written to ``os.environ``, so sessions
+    with different keys never see each other's. The least recently used
+    clients are dropped beyond ``max_clients``.
+    """
+
+    def __init__(self, max_clients=DEFAULT_MAX_CLIENTS):
+        self.max_clients = max_clients
+        self._clients = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, api_key, model, **client_kwargs):
+        key = (key_hash(api_key), model, tuple(sorted(client_kwargs.items())))
+        with self._lock:
+            client = self._clients.get(key)
+            if client is not None:
+                self._clients.move_to_end(key)
+                return client
+
+        from langchain_groq import ChatGroq
+
+        client = ChatGroq(model=model, api_key=api_key, **client_kwargs)
+        with self._lock:
+            # Another thread may have built the same client meanwhile; keep the first
+            client = self._clients.setdefault(key, client)
+            self._clients.move_to_end(key)
+            while len(self._clients) > self.max_clients:
+                self._clients.popitem(last=False)
+        return client
+
+
+_registry = ClientRegistry()
+
+
+def get_llm(api_key, model, **client_kwargs):
+    """Return the shared ChatGroq client for ``api_key``, ``model`` and any extra client settings."""
+    return _registry.get(api_key, model, **client_kwargs)
+
+
+@contextmanager
+def answering_models():
+    """Collect the names of the models that answer LLM calls made inside the block.
+
+    Routers (see model_router) report the model each call ended up on, also
+    from worker threads that inherit the context, such as LangChain's batch
+    executors. Plain clients report nothing, so the set stays empty.
+    """
+    models = set()
+    token = _answering.set(models)
+    try:
+        yield models
+    finally:
+        _answering.reset(token)
+
+
+def note_answering_model(model):
+    """Record that ``model`` answered a call, for an enclosing answering_models block."""
+    models = _answering.get()
+    if models is not None:
+        models.add(model)
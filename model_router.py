@@ -0,0 +1,277 @@
+# Latency-aware routing across the Groq models: retries, hedged requests and fallback
+
+import random
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from langchain_core.runnables import Runnable
+
+from chain_planner import DEFAULT_CONTEXT_WINDOW, MODEL_CONTEXT_WINDOWS
+from llm_clients import DEFAULT_MAX_CLIENTS, get_llm, key_hash, note_answering_model
+from summarization import estimate_tokens
+
+# Status codes worth retrying: rate limited, or a transient server-side failure
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+RETRYABLE_ERROR_NAMES = {"APIConnectionError", "APITimeoutError", "RateLimitError", "InternalServerError"}
+# A rejected API key fails the same way on every model, so don't fall back on these
+NO_FALLBACK_STATUS_CODES = {401, 403}
+DEFAULT_MAX_RETRIES = 2
+BASE_BACKOFF_SECONDS = 0.5
+MAX_BACKOFF_SECONDS = 8.0
+# Hedge after this long while a model has too few samples for a p95
+DEFAULT_HEDGE_SECONDS = 15.0
+MIN_HEDGE_SECONDS = 2.0
+STATS_WINDOW = 100
+MIN_SAMPLES = 5
+# A primary failing more often than this is tried after the healthy models
+UNHEALTHY_ERROR_RATE = 0.5
+
+
+def _status_code(error):
+    return getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+
+
+def is_retryable(error):
+    """True for 429s, 5xx responses, timeouts and connection errors."""
+    status_code = _status_code(error)
+    if status_code is not None:
+        return status_code in RETRYABLE_STATUS_CODES
+    return type(error).__name__ in RETRYABLE_ERROR_NAMES or isinstance(error, (TimeoutError, ConnectionError))
+
+
+def is_rate_limited(error):
+    return _status_code(error) == 429 or type(error).__name__ == "RateLimitError"
+
+
+def _retry_after(error):
+    # Groq sends Retry-After with its 429s; honour it when present
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class ModelStats:
+    """Latencies and outcomes of a model's most recent calls."""
+
+    def __init__(self, window=STATS_WINDOW):
+        self._latencies = deque(maxlen=window)
+        self._outcomes = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds=None, error=False):
+        with self._lock:
+            self._outcomes.append(error)
+            if not error:
+                self._latencies.append(seconds)
+
+    def p95(self):
+        with self._lock:
+            if len(self._latencies) < MIN_SAMPLES:
+                return None
+            latencies = sorted(self._latencies)
+        return latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+
+    def error_rate(self):
+        with self._lock:
+            if len(self._outcomes) < MIN_SAMPLES:
+                return 0.0
+            return sum(self._outcomes) / len(self._outcomes)
+
+    def as_dict(self):
+        p95 = self.p95()
+        return {"calls": len(self._outcomes), "p95_seconds": None if p95 is None else round(p95, 3),
+                "error_rate": round(self.error_rate(), 3)}
+
+
+# Shared by every router in the process, so routing adapts to what all sessions observe.
+# Groq rate-limits each API key on its own, so 429s are counted per key hash instead
+_stats = {}
+_key_stats = {}
+_stats_lock = threading.Lock()
+
+
+def stats_for(model, key_id=None):
+    """Stats of ``model`` across all keys, or of its calls with the API key hashed to ``key_id``."""
+    with _stats_lock:
+        if key_id is None:
+            return _stats.setdefault(model, ModelStats())
+        return _key_stats.setdefault((key_id, model), ModelStats())
+
+
+def model_stats():
+    """Return a snapshot of the per-model latency and error counters."""
+    with _stats_lock:
+        models = list(_stats)
+    return {model: stats_for(model).as_dict() for model in models}
+
+
+class ModelRouter(Runnable):
+    """Chat model wrapper that sends each call to the best available model.
+
+    ``clients`` maps model names to chat models (or anything with ``invoke``
+    and ``stream``, such as a local fake). A call goes to ``primary`` first and
+    is retried with exponential backoff on 429/5xx errors. If it is still
+    running after the primary's p95 latency, the same prompt is also sent to
+    the healthiest secondary model and whichever answers first wins. Models
+    whose context window is too small for the prompt are never used. The
+    model that answered is reported to llm_clients.answering_models. Usable
+    anywhere a chat model is, e.g. ``prompt | router | StrOutputParser()``.
+
+    Latencies and server errors count towards a model's health for every
+    router; rate limits count only for routers sharing ``key_id`` (the
+    API key's hash), and a rejected key doesn't count at all.
+    """
+
+    def __init__(self, clients, primary, max_retries=DEFAULT_MAX_RETRIES, hedge=True,
+                 default_hedge_seconds=DEFAULT_HEDGE_SECONDS, sleep=time.sleep, key_id=None):
+        self.clients = clients
+        self.primary = primary
+        self.key_id = key_id
+        self.max_retries = max_retries
+        self.hedge = hedge
+        self.default_hedge_seconds = default_hedge_seconds
+        self._sleep = sleep
+
+    def _candidates(self, input):
+        # Primary first unless it is failing a lot, then the others by error rate and tail latency
+        tokens = estimate_tokens(input.to_string() if hasattr(input, "to_string") else str(input))
+        models = [model for model in self.clients
+                  if tokens < MODEL_CONTEXT_WINDOWS.get(model, DEFAULT_CONTEXT_WINDOW)]
+        if not models:
+            return [self.primary]
+
+        def rank(model):
+            error_rate = self._error_rate(model)
+            demoted = model != self.primary or error_rate > UNHEALTHY_ERROR_RATE
+            return demoted, round(error_rate, 1), stats_for(model).p95() or self.default_hedge_seconds
+
+        return sorted(models, key=rank)
+
+    def _error_rate(self, model):
+        return max(stats_for(model).error_rate(), stats_for(model, self.key_id).error_rate())
+
+    def _record(self, model, seconds=None, error=None):
+        if error is None:
+            stats_for(model).record(seconds)
+            stats_for(model, self.key_id).record(seconds)
+        elif is_rate_limited(error):
+            stats_for(model, self.key_id).record(error=True)
+        elif _status_code(error) not in NO_FALLBACK_STATUS_CODES:
+            stats_for(model).record(error=True)
+
+    def _hedge_delay(self, model):
+        p95 = stats_for(model).p95()
+        return self.default_hedge_seconds if p95 is None else max(p95, MIN_HEDGE_SECONDS)
+
+    def _backoff(self, attempt, error):
+        delay = _retry_after(error)
+        if delay is None:
+            delay = min(MAX_BACKOFF_SECONDS, BASE_BACKOFF_SECONDS * 2 ** attempt) * (0.5 + random.random())
+        self._sleep(delay)
+
+    def _call(self, model, input, config, **kwargs):
+        # One model with retries; every attempt feeds that model's stats
+        for attempt in range(self.max_retries + 1):
+            started = time.perf_counter()
+            try:
+                result = self.clients[model].invoke(input, config, **kwargs)
+            except Exception as e:
+                self._record(model, error=e)
+                if attempt == self.max_retries or not is_retryable(e):
+                    raise
+                self._backoff(attempt, e)
+            else:
+                self._record(model, time.perf_counter() - started)
+                return result
+
+    def invoke(self, input, config=None, **kwargs):
+        candidates = self._candidates(input)
+        # Threads of this call's own, one per model it may try: nothing caps concurrent calls
+        # process-wide, and the hedge deadline never includes time spent queueing for a thread
+        calls = ThreadPoolExecutor(max_workers=len(candidates), thread_name_prefix="model-call")
+        try:
+            pending = {calls.submit(self._call, candidates[0], input, config, **kwargs): candidates[0]}
+            remaining = candidates[1:]
+            timeout = self._hedge_delay(candidates[0]) if self.hedge else None
+            last_error = None
+            while pending:
+                done, _ = wait(pending, timeout=timeout if remaining else None, return_when=FIRST_COMPLETED)
+                for future in done:
+                    model = pending.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        if _status_code(e) in NO_FALLBACK_STATUS_CODES:
+                            raise
+                        last_error = e
+                    else:
+                        note_answering_model(model)
+                        return result
+                # Start the next model on a timeout (hedge) or once everything in flight has failed
+                if remaining and (not done or not pending):
+                    model = remaining.pop(0)
+                    pending[calls.submit(self._call, model, input, config, **kwargs)] = model
+                    timeout = self._hedge_delay(model) if self.hedge else None
+            raise last_error
+        finally:
+            # The slower call keeps running in the background and still updates the stats
+            calls.shutdown(wait=False)
+
+    def stream(self, input, config=None, **kwargs):
+        # Output already shown can't be swapped for another model's, so streams fall
+        # back only until the first chunk arrives and are never hedged
+        last_error = None
+        for model in self._candidates(input):
+            for attempt in range(self.max_retries + 1):
+                started = time.perf_counter()
+                streamed = False
+                try:
+                    for chunk in self.clients[model].stream(input, config, **kwargs):
+                        if not streamed:
+                            note_answering_model(model)
+                        streamed = True
+                        yield chunk
+                except Exception as e:
+                    self._record(model, error=e)
+                    if streamed:
+                        raise
+                    last_error = e
+                    if _status_code(e) in NO_FALLBACK_STATUS_CODES:
+                        raise
+                    if attempt == self.max_retries or not is_retryable(e):
+                        break
+                    self._backoff(attempt, e)
+                else:
+                    self._record(model, time.perf_counter() - started)
+                    return
+        raise last_error
+
+
+_routers = OrderedDict()
+_routers_lock = threading.Lock()
+
+
+def routed_llm(api_key, primary, models=None):
+    """Return the shared router over ``api_key``'s clients for ``models`` (default: all known models).
+
+    The clients are built without their own retries, so the router alone
+    decides when to retry, wait or switch models. Like the clients, routers
+    are kept per API key, so the chains compiled for one (see
+    summarization._chain) are reused by later requests.
+    """
+    models = tuple(models or MODEL_CONTEXT_WINDOWS)
+    key = (key_hash(api_key), primary, models)
+    with _routers_lock:
+        router = _routers.get(key)
+        if router is not None:
+            _routers.move_to_end(key)
+            return router
+        router = _routers[key] = ModelRouter({model: get_llm(api_key, model, max_retries=0) for model in models},
+                                             primary, key_id=key[0])
+        while len(_routers) > DEFAULT_MAX_CLIENTS:
+            _routers.popitem(last=False)
+    return router
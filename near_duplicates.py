@@ -0,0 +1,140 @@
+# MinHash/LSH index of summarized text, to reuse summaries of mirrored and re-hosted content
+
+import os
+import re
+import time
+import zlib
+
+import numpy as np
+
+from sqlite_connections import ThreadLocalConnections
+from summary_cache import DEFAULT_CACHE_DIR, make_cache_key
+
+NUM_PERMUTATIONS = 128
+# 16 bands of 8 rows: texts with a Jaccard similarity above ~0.7 almost always share a band
+LSH_BANDS = 16
+LSH_ROWS = NUM_PERMUTATIONS // LSH_BANDS
+SHINGLE_WORDS = 5
+# Texts shorter than this have too few shingles for a reliable estimate
+MIN_WORDS = 50
+DEFAULT_THRESHOLD = 0.9
+DEFAULT_MAX_ENTRIES = 20000
+# Shingle hashes are permuted in blocks so a long text never needs a huge matrix
+HASH_BLOCK = 8192
+
+_PRIME = np.uint64(4294967291)  # largest prime below 2**32, so a * x + b never overflows uint64
+_random = np.random.RandomState(20240601)
+_A = _random.randint(1, 2 ** 32 - 5, size=NUM_PERMUTATIONS).astype(np.uint64)
+_B = _random.randint(0, 2 ** 32 - 5, size=NUM_PERMUTATIONS).astype(np.uint64)
+WORD = re.compile(r"\w+")
+
+
+def minhash(text):
+    """Return the MinHash signature of ``text``'s word 5-gram shingles, or None if it is too short."""
+    words = WORD.findall(text.lower())
+    if len(words) < MIN_WORDS:
+        return None
+    hashes = np.fromiter(
+        {zlib.crc32(" ".join(words[i:i + SHINGLE_WORDS]).encode("utf-8")) for i in range(len(words) - SHINGLE_WORDS + 1)},
+        dtype=np.uint64,
+    )
+    signature = np.full(NUM_PERMUTATIONS, _PRIME, dtype=np.uint64)
+    for start in range(0, len(hashes), HASH_BLOCK):
+        block = hashes[start:start + HASH_BLOCK]
+        permuted = (np.outer(_A, block) + _B[:, None]) % _PRIME
+        signature = np.minimum(signature, permuted.min(axis=1))
+    return signature.astype(np.uint32)
+
+
+def similarity(signature, other):
+    """Estimated Jaccard similarity of the shingle sets behind two signatures."""
+    return float(np.mean(signature == other))
+
+
+def _band_keys(signature):
+    return [f"{band}:{zlib.crc32(signature[band * LSH_ROWS:(band + 1) * LSH_ROWS].tobytes()):08x}"
+            for band in range(LSH_BANDS)]
+
+
+class NearDuplicateIndex:
+    """Finds earlier summaries of text that is near-identical to new text.
+
+    Signatures are bucketed by LSH band in SQLite, next to the summary cache,
+    so a lookup reads a handful of candidate rows rather than every entry.
+    Entries are scoped to a model and prompt settings: only a summary made
+    the same way is ever reused. Each entry also records the source it came
+    from, so a lookup can skip earlier versions of the same page, whose
+    changes a reused summary would miss. The oldest entries are dropped
+    beyond ``max_entries``.
+    """
+
+    def __init__(self, index_dir=None, threshold=DEFAULT_THRESHOLD, max_entries=None):
+        index_dir = index_dir or os.environ.get("SUMMARY_CACHE_DIR", DEFAULT_CACHE_DIR)
+        os.makedirs(index_dir, exist_ok=True)
+        self.path = os.path.join(index_dir, "near_duplicates.sqlite3")
+        self.threshold = threshold
+        self.max_entries = int(max_entries or os.environ.get("NEAR_DUPLICATE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES))
+        self._db = ThreadLocalConnections(self.path)
+        with self._db.connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS entries (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    scope TEXT NOT NULL,
+                    source TEXT,
+                    signature BLOB NOT NULL,
+                    summary TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+                """
+            )
+            # Indexes created before entries recorded their source
+            if "source" not in [row[1] for row in conn.execute("PRAGMA table_info(entries)")]:
+                conn.execute("ALTER TABLE entries ADD COLUMN source TEXT")
+            conn.execute("CREATE TABLE IF NOT EXISTS bands (band TEXT NOT NULL, entry_id INTEGER NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_bands ON bands (band)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_bands_entry ON bands (entry_id)")
+
+    def _scoped_bands(self, scope, signature):
+        return [f"{scope}:{band}" for band in _band_keys(signature)]
+
+    def find(self, text, model, source_key=None, **prompt_params):
+        """Return ``(summary, similarity)`` for the closest earlier text above the threshold, else None.
+
+        Entries added with the same ``source_key`` are skipped: they are older
+        versions of this source rather than a copy of it somewhere else.
+        """
+        signature = minhash(text)
+        if signature is None:
+            return None
+        bands = self._scoped_bands(make_cache_key("", model, **prompt_params), signature)
+        rows = self._db.connect().execute(
+            f"SELECT DISTINCT e.signature, e.summary FROM bands b JOIN entries e ON e.id = b.entry_id "
+            f"WHERE b.band IN ({', '.join('?' * len(bands))}) AND (e.source IS NULL OR e.source IS NOT ?)",
+            bands + [source_key],
+        ).fetchall()
+        best = None
+        for blob, summary in rows:
+            score = similarity(signature, np.frombuffer(blob, dtype=np.uint32))
+            if score >= self.threshold and (best is None or score > best[1]):
+                best = (summary, score)
+        return best
+
+    def add(self, text, summary, model, source_key=None, **prompt_params):
+        """Index ``text`` of ``source_key`` with its ``summary``; texts too short to fingerprint are skipped."""
+        signature = minhash(text)
+        if signature is None:
+            return
+        scope = make_cache_key("", model, **prompt_params)
+        bands = self._scoped_bands(scope, signature)
+        with self._db.connect() as conn:
+            entry_id = conn.execute(
+                "INSERT INTO entries (scope, source, signature, summary, created_at) VALUES (?, ?, ?, ?, ?)",
+                (scope, source_key, signature.tobytes(), summary, time.time()),
+            ).lastrowid
+            conn.executemany("INSERT INTO bands (band, entry_id) VALUES (?, ?)", [(band, entry_id) for band in bands])
+            stale = conn.execute(
+                "SELECT id FROM entries ORDER BY id DESC LIMIT -1 OFFSET ?", (self.max_entries,)
+            ).fetchall()
+            conn.executemany("DELETE FROM bands WHERE entry_id = ?", stale)
+            conn.executemany("DELETE FROM entries WHERE id = ?", stale)
@@ -0,0 +1,184 @@
+# Parallel, memory-bounded PDF text extraction
+
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+
+# Uploads larger than this are spooled to a temp file instead of being copied around in memory
+SPOOL_THRESHOLD_BYTES = 16 * 1024 * 1024
+# Below this many pages the process pool start-up costs more than it saves; smaller uploads
+# with at least this many pages are spooled too, since workers open the document by path
+PARALLEL_MIN_PAGES = 64
+DEFAULT_MAX_WORKERS = int(os.environ.get("PDF_MAX_WORKERS", os.cpu_count() or 1))
+
+_pool = None
+_pool_workers = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool(max_workers):
+    # Reuse one pool per process while callers ask for the same size; "spawn" avoids forking
+    # the threaded Streamlit server. A replaced pool still finishes the work already submitted
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is not None and _pool_workers != max_workers:
+            _pool.shutdown(wait=False)
+            _pool = None
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+            _pool_workers = max_workers
+        return _pool
+
+
+def _discard_pool(pool):
+    # A worker died (OOM, a MuPDF crash); the pool refuses all further work, so replace it
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def parse_page_ranges(spec, page_count):
+    """Turn a spec like ``"1-5, 8, 10-"`` (1-based, inclusive) into sorted 0-based page indices."""
+    if not spec or not spec.strip():
+        return list(range(page_count))
+    pages = set()
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        start, _, end = part.partition("-")
+        first = int(start) if start.strip() else 1
+        last = (int(end) if end.strip() else page_count) if "-" in part else first
+        if first < 1 or last < first:
+            raise ValueError(f"Invalid page range: {part!r}")
+        pages.update(range(first - 1, min(last, page_count)))
+    return sorted(pages)
+
+
+def source_size(source):
+    """Size in bytes of a PDF path or binary file-like object, leaving its position unchanged."""
+    if isinstance(source, (str, os.PathLike)):
+        return os.path.getsize(source)
+    size = getattr(source, "size", None)
+    if size is None:
+        position = source.tell()
+        size = source.seek(0, os.SEEK_END)
+        source.seek(position)
+    return size
+
+
+@contextmanager
+def _temp_pdf(write):
+    # Yield the path of a temp file filled by ``write(file)``, removed afterwards
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    try:
+        with os.fdopen(fd, "wb") as spool:
+            write(spool)
+        yield path
+    finally:
+        os.remove(path)
+
+
+@contextmanager
+def spooled_pdf(source):
+    """Yield an argument for ``fitz.open``: a path for large sources, the raw bytes otherwise.
+
+    ``source`` may be a path or a binary file-like object such as a Streamlit UploadedFile.
+    Large uploads are streamed to a temp file so workers can open it by path.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        yield os.fspath(source)
+        return
+
+    size = source_size(source)
+    source.seek(0)
+    if size < SPOOL_THRESHOLD_BYTES:
+        yield source.read()
+        return
+
+    with _temp_pdf(lambda spool: shutil.copyfileobj(source, spool, length=1024 * 1024)) as path:
+        yield path
+
+
+def _open(target):
+    # PyMuPDF is imported on first use, so only PDF users pay for it
+    import fitz
+
+    if isinstance(target, bytes):
+        return fitz.open(stream=target, filetype="pdf")
+    return fitz.open(target)
+
+
+def _extract_pages(target, pages):
+    # Runs inside a worker process; returns the text of each page in order
+    with _open(target) as doc:
+        return [doc[page].get_text() for page in pages]
+
+
+def _batches(pages, batch_count):
+    size = max(1, -(-len(pages) // batch_count))
+    return [pages[i:i + size] for i in range(0, len(pages), size)]
+
+
+def _iter_parallel(path, pages, max_workers, on_progress):
+    # On a broken pool, the pages not yet yielded go to a fresh pool once, then to this process
+    done = 0
+    for _ in range(2):
+        pool = _get_pool(max_workers)
+        batches = _batches(pages[done:], max_workers * 4)
+        try:
+            for batch, texts in zip(batches, pool.map(_extract_pages, [path] * len(batches), batches)):
+                for page, text in zip(batch, texts):
+                    yield page + 1, text
+                done += len(batch)
+                if on_progress:
+                    on_progress(done, len(pages))
+            return
+        except BrokenProcessPool:
+            _discard_pool(pool)
+
+    with _open(path) as doc:
+        for page in pages[done:]:
+            yield page + 1, doc[page].get_text()
+            done += 1
+            if on_progress:
+                on_progress(done, len(pages))
+
+
+def iter_pdf_pages(source, page_spec=None, max_workers=DEFAULT_MAX_WORKERS, on_progress=None):
+    """Yield ``(page_number, text)`` for the selected pages, in page order.
+
+    Documents with at least PARALLEL_MIN_PAGES selected pages are extracted in
+    contiguous page batches by a process pool, whatever their size in bytes.
+    A pool whose worker died is replaced, so one crash doesn't break later uploads.
+    ``on_progress(done, total)`` is called after each batch.
+    """
+    with spooled_pdf(source) as target:
+        with _open(target) as doc:
+            pages = parse_page_ranges(page_spec, len(doc))
+            total = len(pages)
+            if total < PARALLEL_MIN_PAGES or max_workers <= 1:
+                # Small documents: extract in this process, page by page
+                for done, page in enumerate(pages, start=1):
+                    yield page + 1, doc[page].get_text()
+                    if on_progress:
+                        on_progress(done, total)
+                return
+
+        if isinstance(target, bytes):
+            with _temp_pdf(lambda spool: spool.write(target)) as path:
+                yield from _iter_parallel(path, pages, max_workers, on_progress)
+        else:
+            yield from _iter_parallel(target, pages, max_workers, on_progress)
+
+
+def extract_pdf_text(source, page_spec=None, max_workers=DEFAULT_MAX_WORKERS, on_progress=None):
+    """Return the text of the selected pages joined in a single copy."""
+    return "".join(text for _, text in iter_pdf_pages(source, page_spec, max_workers, on_progress))
@@ -0,0 +1,258 @@
+# Headless summarization pipeline: source in, summary out, no Streamlit calls.
+# This is the core both Streamlit apps and the batch CLI call into. Importing it is
+# cheap: LangChain, PyMuPDF, unstructured, youtube_transcript_api and numpy load only
+# when a run needs them.
+
+import time
+
+from chain_planner import plan_summary
+from chapters import MIN_CHAPTERED_SECONDS, format_timestamp, timestamp_url
+from extractors import detect_source_type, load_source_docs
+from llm_clients import answering_models, key_hash
+from pipeline_events import PipelineTracker
+from single_flight import request_key
+from source_identity import source_key
+from summarization import (DEFAULT_CHUNK_TOKENS, DEFAULT_MAX_CONCURRENCY, build_prompt, stream_summary, summarize,
+                           summarize_sections)
+from summary_cache import PartialSummaryMemo, make_cache_key
+
+
+def plan_docs(docs, model, summary_length, strategy=None, incremental=False):
+    """Plan the summary of ``docs``; incremental runs prefer map-reduce over small stable chunks.
+
+    Only map-reduce chunk summaries can be reused when part of the content
+    changes, so in Auto mode an incremental run uses it for anything longer
+    than one DEFAULT_CHUNK_TOKENS chunk, even if the model could take it all at once.
+    """
+    if incremental and strategy is None:
+        plan = plan_summary(docs, model, summary_length, "map_reduce", max_chunk_tokens=DEFAULT_CHUNK_TOKENS)
+        if plan.chunk_count > 1:
+            return plan
+    return plan_summary(docs, model, summary_length, strategy)
+
+
+def is_incremental_source(source, source_cache=None):
+    """True for a web page fetched before, whose earlier chunk summaries may be reused.
+
+    Call it before loading the page. A page seen for the first time is planned
+    for the fewest LLM calls instead; videos and PDFs don't change in place.
+    """
+    if source_cache is None or not isinstance(source, str) or detect_source_type(source) != "website":
+        return False
+    return source_cache.has_page_text(source)
+
+
+def use_chapters(docs, model, summary_length):
+    """True for timed transcript chapters that don't fit one call, or that run past MIN_CHAPTERED_SECONDS.
+
+    Anything shorter is summarized in a single call from the full transcript,
+    which keeps more detail than a summary of chapter summaries.
+    """
+    # Long transcripts arrive as several timed chapters (see extractors.load_youtube_docs)
+    if len(docs) < 2 or not all("start" in doc.metadata for doc in docs):
+        return False
+    if docs[-1].metadata["end"] - docs[0].metadata["start"] >= MIN_CHAPTERED_SECONDS:
+        return True
+    return plan_summary(docs, model, summary_length).strategy != "stuff"
+
+
+def summarize_chapters(docs, llm, model, summary_cache=None, max_concurrency=DEFAULT_MAX_CONCURRENCY, tracker=None,
+                       answered=None):
+    """Summarize every chapter of a transcript concurrently; returns one dict per chapter.
+
+    Each dict has the chapter's ``start`` and ``end`` seconds, its
+    ``timestamp``, a ``url`` that plays the video from there, and its
+    ``summary``. Chapter summaries don't depend on the summary style or
+    length, so with a ``summary_cache`` they are reused across both
+    (``answered`` as for PartialSummaryMemo).
+    """
+    memo = PartialSummaryMemo(summary_cache, model, answered) if summary_cache is not None else None
+    summaries = summarize_sections(llm, [doc.page_content for doc in docs], max_concurrency, tracker, memo)
+    return [
+        {
+            "start": doc.metadata["start"],
+            "end": doc.metadata["end"],
+            "timestamp": format_timestamp(doc.metadata["start"]),
+            "url": timestamp_url(doc.metadata["video_id"], doc.metadata["start"]),
+            "summary": summary,
+        }
+        for doc, summary in zip(docs, summaries)
+    ]
+
+
+def _summary_key(text, model, summary_style, summary_length, plan):
+    return make_cache_key(text, model, summary_style=summary_style, summary_length=summary_length,
+                          strategy=plan.strategy)
+
+
+def summarize_docs(docs, llm, model, summary_style, summary_length, strategy=None, compress_ratio=None,
+                   summary_cache=None, max_concurrency=DEFAULT_MAX_CONCURRENCY, tracker=None, incremental=False,
+                   near_duplicates=None, on_partial_summary=None, source_id=None):
+    """Summarize extracted ``docs``; returns ``(summary, cached)``.
+
+    The optional pre-compression, planning and summary cache lookup all happen
+    here, so every front end produces the same cache keys for the same input.
+    With ``incremental`` (see is_incremental_source) and a ``summary_cache``,
+    chunk and merge summaries are memoized so a changed page only
+    re-summarizes the chunks that changed. With a
+    ``near_duplicates`` index, the summary of near-identical text from another
+    source, made with the same model and settings, is reused, and its
+    similarity noted on the tracker as "near_duplicate". Earlier versions of
+    ``source_id`` (see source_identity.source_key) never match, and
+    incremental runs skip the lookup, so an updated page is always summarized
+    again. ``on_partial_summary``, if given, is called with the
+    summary so far as the final call streams it, at most once per
+    ``tracker.min_interval`` and once more with the whole summary.
+
+    Long transcripts (see use_chapters) are summarized chapter by chapter
+    first, noted on the tracker as "chapters", and the summary is written from
+    those; near-duplicate reuse doesn't apply to them.
+
+    When ``llm`` is a router that fell back to other models, the models that
+    answered are noted on the tracker as "answered_by", and the summary is
+    kept out of the caches and the index, which hold ``model``'s output only.
+    """
+    tracker = tracker or PipelineTracker()
+    with answering_models() as answered:
+        return _summarize_docs(docs, llm, model, summary_style, summary_length, strategy, compress_ratio,
+                               summary_cache, max_concurrency, tracker, incremental, near_duplicates,
+                               on_partial_summary, source_id, answered)
+
+
+def _summarize_docs(docs, llm, model, summary_style, summary_length, strategy, compress_ratio, summary_cache,
+                    max_concurrency, tracker, incremental, near_duplicates, on_partial_summary, source_id,
+                    answered):
+    if compress_ratio:
+        from precompression import compress_documents
+
+        docs = compress_documents(docs, compress_ratio, tracker)
+
+    if use_chapters(docs, model, summary_length):
+        from langchain.schema import Document
+
+        chapters = summarize_chapters(docs, llm, model, summary_cache, max_concurrency, tracker, answered)
+        tracker.note("chapters", chapters)
+        text = "\n\n".join(f"[{chapter['timestamp']}] {chapter['summary']}" for chapter in chapters)
+        docs = [Document(page_content=text, metadata={"source": docs[0].metadata["source"]})]
+        # Exact reruns hit the cache through the memoized chapter summaries; fingerprints of them add nothing
+        near_duplicates = None
+
+    incremental = incremental and summary_cache is not None
+    text = "\n".join(doc.page_content for doc in docs)
+    plan = plan_docs(docs, model, summary_length, strategy)
+    cache_key = _summary_key(text, model, summary_style, summary_length, plan)
+    summary = summary_cache.get(cache_key) if summary_cache else None
+    if summary is None and incremental:
+        # Checked second, so an unchanged page still hits the summary of its first, non-incremental run
+        incremental_plan = plan_docs(docs, model, summary_length, strategy, incremental=True)
+        if incremental_plan.as_dict() != plan.as_dict():
+            plan = incremental_plan
+            cache_key = _summary_key(text, model, summary_style, summary_length, plan)
+            summary = summary_cache.get(cache_key)
+    tracker.note("plan", plan.as_dict())
+    if summary is not None:
+        return summary, True
+
+    match = None
+    # An incremental run is a new version of a page summarized before: its changes are the point
+    if near_duplicates is not None and not incremental:
+        match = near_duplicates.find(text, model, source_key=source_id, summary_style=summary_style,
+                                     summary_length=summary_length)
+    if match is not None:
+        summary, score = match
+        tracker.note("near_duplicate", round(score, 3))
+        if summary_cache:
+            summary_cache.set(cache_key, summary)
+        return summary, True
+
+    prompt = build_prompt(summary_style, summary_length)
+    memo = PartialSummaryMemo(summary_cache, model, answered) if incremental else None
+    if on_partial_summary is None:
+        summary = summarize(llm, docs, prompt, plan, max_concurrency=max_concurrency, tracker=tracker, memo=memo)
+    else:
+        # New tokens are appended in batches, at most once per tracker.min_interval, so
+        # a long summary costs a bounded number of re-renders rather than one per token
+        summary, pending, last_render = "", [], 0.0
+        for token in stream_summary(llm, docs, prompt, plan, max_concurrency=max_concurrency, tracker=tracker, memo=memo):
+            pending.append(token)
+            now = time.perf_counter()
+            if now - last_render >= tracker.min_interval:
+                summary += "".join(pending)
+                pending.clear()
+                last_render = now
+                on_partial_summary(summary)
+        summary += "".join(pending)
+        on_partial_summary(summary)
+    if answered - {model}:
+        tracker.note("answered_by", sorted(answered))
+        return summary, False
+    if summary_cache:
+        summary_cache.set(cache_key, summary)
+    if near_duplicates is not None:
+        near_duplicates.add(text, summary, model, source_key=source_id, summary_style=summary_style,
+                            summary_length=summary_length)
+    return summary, False
+
+
+def summarize_source(source, llm, model, summary_style, summary_length, strategy=None, compress_ratio=None,
+                     page_spec=None, source_cache=None, summary_cache=None,
+                     max_concurrency=DEFAULT_MAX_CONCURRENCY, tracker=None, single_flight=None, near_duplicates=None,
+                     on_partial_summary=None, api_key=None):
+    """Extract ``source`` and summarize it; returns a dict with the summary and run details.
+
+    ``source`` is a YouTube URL, website URL, PDF path or uploaded PDF. Safe to
+    call from worker threads: progress goes to ``tracker`` only. With a
+    ``single_flight``, a call identical to one already running waits for that
+    one's result instead of fetching and summarizing again, and the tracker
+    gets a "shared_in_flight" note. Only calls made with the same ``api_key``
+    (the key behind ``llm``) are coalesced, so nobody receives a summary or a
+    401/429 that belongs to another user's key.
+    """
+    tracker = tracker or PipelineTracker()
+    # Hashing an uploaded PDF reads all of it, so only when something needs the identity
+    source_id = source_key(source) if single_flight is not None or near_duplicates is not None else None
+    options = dict(strategy=strategy, compress_ratio=compress_ratio, page_spec=page_spec, source_cache=source_cache,
+                   summary_cache=summary_cache, max_concurrency=max_concurrency, tracker=tracker,
+                   near_duplicates=near_duplicates, on_partial_summary=on_partial_summary, source_id=source_id)
+    if single_flight is None:
+        return _summarize_source(source, llm, model, summary_style, summary_length, **options)
+
+    # Without the key, fall back to the client object: shared clients are kept per key (see llm_clients)
+    credentials = key_hash(api_key) if api_key else f"llm:{id(llm)}"
+    key = request_key(source_id, model, credentials=credentials, summary_style=summary_style,
+                      summary_length=summary_length, strategy=strategy, compress_ratio=compress_ratio,
+                      page_spec=page_spec)
+    led = []
+
+    def lead():
+        led.append(True)
+        return _summarize_source(source, llm, model, summary_style, summary_length, **options)
+
+    result = single_flight.do(key, lead)
+    if not led:
+        tracker.note("shared_in_flight", True)
+    return result
+
+
+def _summarize_source(source, llm, model, summary_style, summary_length, strategy, compress_ratio, page_spec,
+                      source_cache, summary_cache, max_concurrency, tracker, near_duplicates, on_partial_summary,
+                      source_id):
+    # Decided before loading, which stores the page in the source cache
+    incremental = is_incremental_source(source, source_cache)
+    docs, source_info = load_source_docs(source, source_cache, tracker, page_spec)
+    if not any(doc.page_content.strip() for doc in docs):
+        raise ValueError("No content could be extracted from the provided source.")
+
+    summary, cached = summarize_docs(docs, llm, model, summary_style, summary_length, strategy, compress_ratio,
+                                     summary_cache, max_concurrency, tracker, incremental,
+                                     near_duplicates, on_partial_summary, source_id)
+    return {
+        "summary": summary,
+        "source_info": source_info,
+        "cached": cached,
+        "near_duplicate": tracker.notes.get("near_duplicate"),
+        "chapters": tracker.notes.get("chapters"),
+        "plan": tracker.notes.get("plan"),
+        "answered_by": tracker.notes.get("answered_by"),
+        "timings": tracker.breakdown(),
+    }
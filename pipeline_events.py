@@ -0,0 +1,71 @@
+# Stage timings and progress for the summarization pipeline
+
+import time
+from contextlib import contextmanager
+
+# Overall progress reached when each pipeline stage finishes, in the order they run
+STAGE_PROGRESS = {"validate": 5, "fetch": 30, "extract": 50, "compress": 53, "chunk": 55, "llm": 95, "render": 100}
+
+
+class StageRecord:
+    """Timing and size counters for one run of a pipeline stage."""
+
+    def __init__(self, name, detail=None):
+        self.name = name
+        self.detail = detail
+        self.started_at = time.perf_counter()
+        self.seconds = 0.0
+        self.bytes = 0
+        self.tokens = 0
+
+    def as_row(self):
+        label = f"{self.name} ({self.detail})" if self.detail else self.name
+        return {"stage": label, "seconds": round(self.seconds, 3), "bytes": self.bytes, "tokens": self.tokens}
+
+
+class PipelineTracker:
+    """Collects stage records and reports progress as stages finish.
+
+    Progress updates go to ``on_progress(percent, label)`` no more often than
+    every ``min_interval`` seconds, so a 1,000 page PDF does not re-render the
+    progress bar 1,000 times.
+    """
+
+    def __init__(self, on_progress=None, min_interval=0.1):
+        self.records = []
+        # Run-level facts worth reporting next to the timings, e.g. the chosen summary plan
+        self.notes = {}
+        self.on_progress = on_progress
+        self.min_interval = min_interval
+        self._last_progress = 0.0
+
+    @contextmanager
+    def stage(self, name, detail=None):
+        """Time the wrapped block; the yielded record takes ``bytes`` and ``tokens`` counts."""
+        record = StageRecord(name, detail)
+        self.records.append(record)
+        try:
+            yield record
+        finally:
+            record.seconds = time.perf_counter() - record.started_at
+            if name in STAGE_PROGRESS:
+                self.progress(STAGE_PROGRESS[name], f"Finished {record.as_row()['stage']}", force=True)
+
+    def progress(self, percent, label, force=False):
+        if self.on_progress is None:
+            return
+        now = time.perf_counter()
+        if not force and now - self._last_progress < self.min_interval:
+            return
+        self._last_progress = now
+        self.on_progress(min(int(percent), 100), label)
+
+    def note(self, key, value):
+        self.notes[key] = value
+
+    def total_seconds(self):
+        return sum(record.seconds for record in self.records)
+
+    def breakdown(self):
+        """Return one row per stage run, suitable for ``st.table``."""
+        return [record.as_row() for record in self.records]
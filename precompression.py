@@ -0,0 +1,172 @@
+# Extractive pre-compression: keep the most salient sentences before the LLM sees the text
+
+import re
+import zlib
+
+import numpy as np
+from langchain.schema import Document
+
+from pipeline_events import PipelineTracker
+from summarization import estimate_tokens
+
+DEFAULT_TARGET_RATIO = 0.35
+# Inputs shorter than this go to the LLM untouched; compressing them saves little
+MIN_COMPRESS_TOKENS = 2000
+DUPLICATE_THRESHOLD = 0.85
+# Terms are hashed into this many TF-IDF columns so memory stays O(sentences)
+HASH_DIM = 1024
+DAMPING = 0.85
+PAGERANK_ITERATIONS = 30
+# Transcripts often have no punctuation; fall back to fixed windows of this many words
+WINDOW_WORDS = 25
+SELECT_BLOCK = 256
+
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+|\n{2,}")
+WORD = re.compile(r"[a-z0-9']+")
+STOPWORDS = frozenset("""
+a about after all also an and any are as at be because been but by can could did do does for from had
+has have he her his how i if in into is it its just like me more most my no not now of on one only or
+other our out over so some such than that the their them then there these they this to too up us very
+was we were what when where which who will with would you your yeah um uh okay oh right really going
+gonna know think actually basically kind sort thing things get got
+""".split())
+
+
+def split_sentences(text):
+    """Split on sentence punctuation, or into word windows when there is too little of it."""
+    sentences = [s.strip() for s in SENTENCE_BOUNDARY.split(text) if s.strip()]
+    words = text.split()
+    if len(sentences) * WINDOW_WORDS * 3 < len(words):
+        # Fewer than one boundary per ~75 words: auto-captions or similar run-on text
+        sentences = [" ".join(words[i:i + WINDOW_WORDS]) for i in range(0, len(words), WINDOW_WORDS)]
+    return sentences
+
+
+def _tfidf_matrix(sentences):
+    # Row-normalized TF-IDF over hashed terms; crc32 keeps the hashing stable across processes
+    rows, cols = [], []
+    for row, sentence in enumerate(sentences):
+        for word in WORD.findall(sentence.lower()):
+            if word not in STOPWORDS:
+                rows.append(row)
+                cols.append(zlib.crc32(word.encode("utf-8")) % HASH_DIM)
+    n = len(sentences)
+    counts = np.bincount(np.asarray(rows, dtype=np.int64) * HASH_DIM + np.asarray(cols, dtype=np.int64),
+                         minlength=n * HASH_DIM).reshape(n, HASH_DIM).astype(np.float32)
+    document_frequency = (counts > 0).sum(axis=0)
+    idf = np.log((1 + n) / (1 + document_frequency)).astype(np.float32) + 1
+    matrix = np.log1p(counts) * idf
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-9)
+
+
+def textrank_scores(matrix):
+    """TextRank centrality over the cosine-similarity graph without building the n x n matrix.
+
+    With row-normalized vectors S, the similarity matrix is W = S S^T minus the
+    diagonal, so ``W @ y`` is ``S @ (S.T @ y) - y`` and every power iteration
+    costs O(sentences x HASH_DIM).
+    """
+    n = matrix.shape[0]
+    self_similarity = np.einsum("ij,ij->i", matrix, matrix)
+    degree = matrix @ matrix.sum(axis=0) - self_similarity
+    degree = np.maximum(degree, 1e-9)
+    scores = np.full(n, 1.0 / n, dtype=np.float32)
+    for _ in range(PAGERANK_ITERATIONS):
+        y = scores / degree
+        scores = (1 - DAMPING) / n + DAMPING * (matrix @ (matrix.T @ y) - self_similarity * y)
+    return scores
+
+
+def _select(matrix, order, token_counts, budget_tokens, threshold):
+    # Greedy by score, skipping sentences too similar to one already kept
+    selected, used = [], 0
+    for start in range(0, len(order), SELECT_BLOCK):
+        block = order[start:start + SELECT_BLOCK]
+        if selected:
+            max_previous = (matrix[block] @ matrix[selected].T).max(axis=1)
+        else:
+            max_previous = np.zeros(len(block), dtype=np.float32)
+        accepted = []
+        for index, similarity in zip(block, max_previous):
+            if similarity >= threshold:
+                continue
+            if accepted and (matrix[accepted] @ matrix[index]).max() >= threshold:
+                continue
+            accepted.append(index)
+            used += token_counts[index]
+            if used >= budget_tokens:
+                return sorted(selected + accepted)
+        selected.extend(accepted)
+    return sorted(selected)
+
+
+def _rank_and_select(sentences, target_ratio, duplicate_threshold):
+    # Returns the indices of the sentences to keep, in order, and every sentence's score
+    matrix = _tfidf_matrix(sentences)
+    scores = textrank_scores(matrix)
+    token_counts = np.fromiter((estimate_tokens(s) for s in sentences), dtype=np.int64, count=len(sentences))
+    budget = int(token_counts.sum() * target_ratio)
+    order = np.argsort(-scores, kind="stable").tolist()
+    return _select(matrix, order, token_counts, budget, duplicate_threshold), scores
+
+
+def compress_text(text, target_ratio=DEFAULT_TARGET_RATIO, duplicate_threshold=DUPLICATE_THRESHOLD):
+    """Return ``text`` cut to about ``target_ratio`` of its tokens, keeping the most central sentences.
+
+    Sentences are scored by TextRank centrality over TF-IDF vectors, picked
+    greedily while dropping near-duplicates, and returned in their original order.
+    """
+    if estimate_tokens(text) < MIN_COMPRESS_TOKENS:
+        return text
+    sentences = split_sentences(text)
+    if len(sentences) < 3:
+        return text
+    keep, _ = _rank_and_select(sentences, target_ratio, duplicate_threshold)
+    return " ".join(sentences[i] for i in keep)
+
+
+def _compress_together(texts, target_ratio, duplicate_threshold=DUPLICATE_THRESHOLD):
+    # Rank the sentences of all texts at once, so the budget, the MIN_COMPRESS_TOKENS threshold
+    # and near-duplicate removal span the whole input; each text keeps its own sentences
+    if sum(map(estimate_tokens, texts)) < MIN_COMPRESS_TOKENS:
+        return texts
+    sentences, owners = [], []
+    for owner, text in enumerate(texts):
+        for sentence in split_sentences(text):
+            sentences.append(sentence)
+            owners.append(owner)
+    if len(sentences) < 3:
+        return texts
+    keep, scores = _rank_and_select(sentences, target_ratio, duplicate_threshold)
+    kept = [[] for _ in texts]
+    for i in keep:
+        kept[owners[i]].append(i)
+    best = {}
+    for i, owner in enumerate(owners):
+        if owner not in best or scores[i] > scores[best[owner]]:
+            best[owner] = i
+    for owner, indices in enumerate(kept):
+        # A text whose every sentence lost out still keeps its most central one
+        if not indices and owner in best:
+            indices.append(best[owner])
+    return [" ".join(sentences[i] for i in indices) for indices in kept]
+
+
+def compress_documents(docs, target_ratio=DEFAULT_TARGET_RATIO, tracker=None):
+    """Compress ``docs`` as one text while keeping them apart; metadata records each one's ratio.
+
+    Documents such as transcript chapters are each too short to be worth
+    compressing on their own, so the size threshold, the token budget and
+    near-duplicate removal apply to all of them together.
+    """
+    tracker = tracker or PipelineTracker()
+    with tracker.stage("compress") as record:
+        compressed = []
+        for doc, text in zip(docs, _compress_together([doc.page_content for doc in docs], target_ratio)):
+            ratio = len(text) / max(len(doc.page_content), 1)
+            compressed.append(Document(page_content=text, metadata=dict(doc.metadata, compression_ratio=round(ratio, 3))))
+        record.tokens = sum(estimate_tokens(doc.page_content) for doc in compressed)
+    before = sum(len(doc.page_content) for doc in docs)
+    tracker.note("compression_ratio", round(sum(len(doc.page_content) for doc in compressed) / max(before, 1), 3))
+    return compressed
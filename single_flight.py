@@ -0,0 +1,153 @@
+# Coalesce identical in-flight summarization requests into one computation
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+from summary_cache import make_cache_key
+
+
+def request_key(source_key, model, **params):
+    """Combine a normalized source identity with the model and prompt parameters."""
+    return make_cache_key(source_key, model, **params)
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        # Set when the leader was interrupted (e.g. a Streamlit rerun) rather than failing
+        self.aborted = False
+
+
+class FileLockBackend:
+    """Extends single-flight across worker processes that share ``directory``.
+
+    The leader in each process takes an exclusive ``flock`` on a per-key lock
+    file and leaves its result next to it. Callers that were blocked on the
+    lock while that result was computed pick it up instead of computing
+    again; a caller that arrives afterwards computes afresh, so this never
+    acts as a result cache. Results must be JSON-serializable. Files of keys
+    unused for ``stale_after`` seconds are removed. Needs ``fcntl``, so it is
+    POSIX only.
+    """
+
+    def __init__(self, directory, stale_after=120):
+        import fcntl
+
+        self._fcntl = fcntl
+        self.directory = directory
+        self.stale_after = stale_after
+        os.makedirs(directory, exist_ok=True)
+
+    def _paths(self, key):
+        name = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, name + ".lock"), os.path.join(self.directory, name + ".json")
+
+    def run(self, key, func):
+        lock_path, result_path = self._paths(key)
+        waiting_since = time.time()
+        with open(lock_path, "a") as lock_file:
+            self._fcntl.flock(lock_file, self._fcntl.LOCK_EX)
+            try:
+                # Marks the key as in use, so _sweep leaves it alone
+                os.utime(lock_path)
+                try:
+                    # Only a result written while this call waited came from an overlapping request
+                    if os.path.getmtime(result_path) >= waiting_since:
+                        with open(result_path, encoding="utf-8") as f:
+                            return json.load(f)
+                except (OSError, ValueError):
+                    pass
+                result = func()
+                tmp_path = f"{result_path}.{os.getpid()}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(result, f)
+                os.replace(tmp_path, result_path)
+            finally:
+                self._fcntl.flock(lock_file, self._fcntl.LOCK_UN)
+        self._sweep()
+        return result
+
+    def _sweep(self):
+        # A lock file is removed only while this process holds it, so at worst a caller that
+        # opened it just before computes again instead of sharing a result
+        cutoff = time.time() - self.stale_after
+        for name in os.listdir(self.directory):
+            if not name.endswith(".lock"):
+                continue
+            lock_path = os.path.join(self.directory, name)
+            try:
+                if os.path.getmtime(lock_path) > cutoff:
+                    continue
+                with open(lock_path, "a") as lock_file:
+                    try:
+                        self._fcntl.flock(lock_file, self._fcntl.LOCK_EX | self._fcntl.LOCK_NB)
+                    except OSError:
+                        continue  # in use
+                    os.remove(lock_path)
+                    try:
+                        os.remove(lock_path[:-len(".lock")] + ".json")
+                    except FileNotFoundError:
+                        pass
+            except OSError:
+                continue
+
+
+class SingleFlight:
+    """Runs at most one computation per key at a time; concurrent callers share its outcome.
+
+    Threads of one server process are coalesced in memory. With a ``backend``
+    such as FileLockBackend the leaders of different processes coalesce too;
+    setting SINGLE_FLIGHT_DIR picks a FileLockBackend on that shared directory.
+    """
+
+    def __init__(self, backend=None):
+        if backend is None and os.environ.get("SINGLE_FLIGHT_DIR"):
+            backend = FileLockBackend(os.environ["SINGLE_FLIGHT_DIR"])
+        self.backend = backend
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, func, *args, **kwargs):
+        """Return ``func(*args, **kwargs)``, or the result of an identical call already in flight.
+
+        A leader interrupted by a ``BaseException`` that isn't an ``Exception``
+        (such as Streamlit's RerunException) shares nothing: its followers race
+        again and one of them computes the result as the new leader.
+        """
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                leader = call is None
+                if leader:
+                    call = self._calls[key] = _Call()
+
+            if leader:
+                break
+            call.done.wait()
+            if call.aborted:
+                continue
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            if self.backend is not None:
+                call.result = self.backend.run(key, lambda: func(*args, **kwargs))
+            else:
+                call.result = func(*args, **kwargs)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        except BaseException:
+            call.aborted = True
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
@@ -0,0 +1,260 @@
+# Extraction-level cache for YouTube transcripts and web page text
+
+import codecs
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+
+from html_extraction import parse_document, parse_html
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "content-summarizer", "sources")
+USER_AGENT = "Mozilla/5.0 (Macintosh; Intel Mac OS X 13_5_1) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/116.0.0.0 Safari/537.36"
+
+# How long an entry is served without asking the origin again, per source type
+SOURCE_TTLS = {
+    "youtube": 7 * 24 * 60 * 60,  # transcripts almost never change once published
+    "website": 60 * 60,  # pages are revalidated with ETag / Last-Modified after this
+}
+# Entries are kept past their TTL so pages can be revalidated, but not past this age or total size
+DEFAULT_MAX_AGE_SECONDS = 30 * 24 * 60 * 60  # one month
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024  # 512 MB of transcripts and page text
+# Transcript languages in order of preference; anything else is used only when none of these exist
+PREFERRED_LANGUAGES = tuple(code.strip() for code in os.environ.get("TRANSCRIPT_LANGUAGES", "en").split(",") if code.strip())
+
+
+class FileSystemBackend:
+    """Stores one JSON file per key in ``directory``.
+
+    Writes go through a temp file and ``os.replace`` so concurrent readers in
+    other sessions or processes never see a half-written entry. Every write
+    removes files older than ``max_age_seconds``, then the least recently used
+    ones until the directory holds at most ``max_bytes``.
+    """
+
+    def __init__(self, directory=None, max_bytes=None, max_age_seconds=None):
+        self.directory = directory or os.environ.get("SOURCE_CACHE_DIR", DEFAULT_CACHE_DIR)
+        self.max_bytes = int(max_bytes or os.environ.get("SOURCE_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES))
+        self.max_age_seconds = int(max_age_seconds or os.environ.get("SOURCE_CACHE_MAX_AGE", DEFAULT_MAX_AGE_SECONDS))
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha256(key.encode("utf-8")).hexdigest() + ".json")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                entry = json.load(f)
+            # The modification time doubles as the last access time for eviction
+            os.utime(path)
+            return entry
+        except (OSError, ValueError):
+            return None
+
+    def set(self, key, entry):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, self._path(key))
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+        self._evict(time.time())
+
+    def _evict(self, now):
+        files = []
+        for item in os.scandir(self.directory):
+            try:
+                stat = item.stat()
+            except OSError:
+                continue  # removed by another process meanwhile
+            # Temp files older than an hour were left by a writer that died mid-write
+            if now - stat.st_mtime > self.max_age_seconds or (item.name.endswith(".tmp") and now - stat.st_mtime > 3600):
+                self._remove(item.path)
+            elif item.name.endswith(".json"):
+                files.append((stat.st_mtime, stat.st_size, item.path))
+        total = sum(size for _, size, _ in files)
+        # Drop the least recently used entries until we are back under the size limit
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def pick_transcript(transcripts, languages=PREFERRED_LANGUAGES):
+    """Pick the best of a video's transcripts: a preferred language first, then manual over generated captions."""
+    def rank(transcript):
+        language = transcript.language_code.split("-")[0]
+        preference = languages.index(language) if language in languages else len(languages)
+        return preference, transcript.is_generated
+
+    if not transcripts:
+        raise ValueError("No transcripts are available for this video")
+    # min keeps the listing order among equals, so ties go to the caption track YouTube lists first
+    return min(transcripts, key=rank)
+
+
+def fetch_transcript(video_id, languages=PREFERRED_LANGUAGES):
+    """Fetch a video's transcript in the best available language; returns ``(segments, language_code)``.
+
+    One listing call finds every caption track, so a video without the
+    preferred language costs no extra round trip. Segments have ``text``,
+    ``start`` and ``duration``.
+    """
+    from youtube_transcript_api import YouTubeTranscriptApi
+
+    # youtube_transcript_api 1.x lists through an instance, earlier versions through a classmethod
+    api = YouTubeTranscriptApi()
+    listing = api.list(video_id) if hasattr(api, "list") else YouTubeTranscriptApi.list_transcripts(video_id)
+    transcript = pick_transcript(list(listing), languages)
+    fetched = transcript.fetch()
+    segments = fetched.to_raw_data() if hasattr(fetched, "to_raw_data") else fetched
+    return segments, transcript.language_code
+
+
+# Keep-alive connections kept open per host, shared by every thread of the process
+HTTP_POOL_SIZE = int(os.environ.get("HTTP_POOL_SIZE", "16"))
+_session = None
+_session_lock = threading.Lock()
+
+
+def _http_session():
+    # One session per process: Streamlit runs each rerun on a new thread, so per-thread
+    # sessions would never reuse a connection. urllib3's pools are thread-safe, and
+    # refusing cookies keeps the shared session free of any one user's state
+    global _session
+    with _session_lock:
+        if _session is None:
+            from http.cookiejar import DefaultCookiePolicy
+
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            session = requests.Session()
+            session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+            adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session = session
+        return _session
+
+
+HTML_CONTENT_TYPES = {"text/html", "application/xhtml+xml"}
+CHARSET_PATTERN = re.compile(r"""charset\s*=\s*["']?\s*([\w.:-]+)""", re.IGNORECASE)
+# Both <meta charset="..."> and <meta http-equiv="Content-Type" content="...; charset=...">
+META_CHARSET_PATTERN = re.compile(r"<meta[^>]+" + CHARSET_PATTERN.pattern, re.IGNORECASE)
+# Browsers look for <meta charset> in the first 1024 bytes; some pages put it a little later
+META_SCAN_BYTES = 4096
+
+
+def declared_charset(content, content_type=""):
+    """The charset named by a Content-Type header, else by the page's <meta> tag; None if neither names a known one."""
+    head = content[:META_SCAN_BYTES].decode("ascii", errors="replace")
+    for declared in (CHARSET_PATTERN.search(content_type or ""), META_CHARSET_PATTERN.search(head)):
+        if declared:
+            try:
+                return codecs.lookup(declared.group(1)).name
+            except LookupError:
+                continue
+    return None
+
+
+def fetch_page(url, etag=None, last_modified=None):
+    """Conditional GET; returns ``(status_code, body, etag, last_modified)``.
+
+    ``body`` is the decoded text of an HTML response, and the raw bytes of
+    anything else (a linked PDF, say), for unstructured to detect its type.
+    HTML is decoded with its declared charset, else the one requests detects:
+    requests' own ISO-8859-1 default for text/html would garble UTF-8 pages.
+    """
+    headers = {"User-Agent": USER_AGENT}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+    response = _http_session().get(url, headers=headers, verify=False, timeout=30)
+    if response.status_code != 304:
+        response.raise_for_status()
+    content_type = response.headers.get("Content-Type", "")
+    body = response.content
+    if content_type.split(";")[0].strip().lower() in HTML_CONTENT_TYPES:
+        encoding = declared_charset(body, content_type) or response.apparent_encoding or "utf-8"
+        body = body.decode(encoding, errors="replace")
+    return response.status_code, body, response.headers.get("ETag"), response.headers.get("Last-Modified")
+
+
+class SourceCache:
+    """Caches fetched source content so re-summarizing skips fetching and parsing.
+
+    The fetch and parse callables can be swapped for local stand-ins, and any
+    object with ``get(key)`` / ``set(key, entry)`` works as the backend.
+    ``parse_document`` handles the pages that ``fetch_page`` returns as bytes.
+    """
+
+    def __init__(self, backend=None, ttls=None, fetch_transcript=fetch_transcript,
+                 fetch_page=fetch_page, parse_html=parse_html, parse_document=parse_document):
+        self.backend = backend or FileSystemBackend()
+        self.ttls = dict(SOURCE_TTLS, **(ttls or {}))
+        self.fetch_transcript = fetch_transcript
+        self.fetch_page = fetch_page
+        self.parse_html = parse_html
+        self.parse_document = parse_document
+
+    def _is_fresh(self, entry, source_type):
+        return time.time() - entry["fetched_at"] < self.ttls[source_type]
+
+    def get_transcript(self, video_id, languages=PREFERRED_LANGUAGES):
+        """Return ``(segments, language_code)`` of ``video_id``'s best transcript for ``languages``."""
+        # Keyed by the language preference too, so changing it never serves the previous choice
+        key = f"youtube:{video_id}:{','.join(languages)}"
+        entry = self.backend.get(key)
+        if entry is not None and self._is_fresh(entry, "youtube"):
+            return entry["segments"], entry["language"]
+
+        segments, language = self.fetch_transcript(video_id, languages)
+        self.backend.set(key, {"segments": list(segments), "language": language, "fetched_at": time.time()})
+        return segments, language
+
+    def has_page_text(self, url):
+        """True if ``url`` was fetched before, however long ago."""
+        return self.backend.get(f"website:{url}") is not None
+
+    def get_page_text(self, url):
+        """Return the cleaned text of ``url``, revalidating stale entries with the origin."""
+        key = f"website:{url}"
+        entry = self.backend.get(key)
+        if entry is not None and self._is_fresh(entry, "website"):
+            return entry["text"]
+
+        etag = entry.get("etag") if entry else None
+        last_modified = entry.get("last_modified") if entry else None
+        status, body, new_etag, new_last_modified = self.fetch_page(url, etag, last_modified)
+        if status == 304 and entry is not None:
+            # Unchanged at the origin: keep the parsed text and restart its TTL
+            entry["fetched_at"] = time.time()
+            self.backend.set(key, entry)
+            return entry["text"]
+
+        text = self.parse_html(body) if isinstance(body, str) else self.parse_document(body)
+        self.backend.set(key, {
+            "text": text,
+            "etag": new_etag,
+            "last_modified": new_last_modified,
+            "fetched_at": time.time(),
+        })
+        return text
@@ -0,0 +1,74 @@
+# Normalized identities for sources, so the same content is recognized behind different inputs
+
+import hashlib
+import re
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from extractors import detect_source_type, extract_video_id, is_youtube_url
+
+# Query parameters that only track where a click came from, or select the AMP variant. Generic
+# names such as ref and amp are left alone: many sites use them to pick what the page shows
+TRACKING_PARAMS = {"fbclid", "gclid", "dclid", "msclkid", "mc_cid", "mc_eid", "igshid", "ref_src", "outputtype"}
+# Share-link parameters that only YouTube is known to ignore
+YOUTUBE_TRACKING_PARAMS = {"si", "feature"}
+# Host prefixes of mobile and AMP mirrors of the same site
+MIRROR_HOST_PREFIXES = ("www.", "m.", "mobile.", "amp.")
+AMP_CACHE_PATH = re.compile(r"^/(?:amp|c)/(?:s/)?(?P<url>.+)$")
+
+
+def _unwrap_amp_cache(parts):
+    # google.com/amp/s/example.com/x and example-com.cdn.ampproject.org/c/s/example.com/x
+    host = parts.netloc.lower()
+    match = AMP_CACHE_PATH.match(parts.path)
+    if match and (host.endswith("cdn.ampproject.org") or host.split(".")[-2:-1] == ["google"]):
+        return urlsplit(f"https://{match.group('url')}" + (f"?{parts.query}" if parts.query else ""))
+    return parts
+
+
+def canonical_url(url):
+    """Return one URL for all the addresses of the same page.
+
+    Lower-cases scheme and host, drops www./m./amp. host prefixes, unwraps
+    Google AMP cache URLs, strips a trailing /amp segment and .amp.html
+    suffixes, removes fragments and tracking parameters, and sorts the query.
+    """
+    parts = _unwrap_amp_cache(urlsplit(url.strip()))
+    host = parts.netloc.lower()
+    for prefix in MIRROR_HOST_PREFIXES:
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+    path = re.sub(r"/amp$|\.amp(?=\.html?$)", "", parts.path.rstrip("/")) or "/"
+    tracking = TRACKING_PARAMS | YOUTUBE_TRACKING_PARAMS if is_youtube_url(urlunsplit(parts)) else TRACKING_PARAMS
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key.lower() not in tracking and not key.lower().startswith("utm_")
+    )
+    return urlunsplit(("https" if parts.scheme.lower() in ("http", "https") else parts.scheme.lower(),
+                       host, path, urlencode(query), ""))
+
+
+def pdf_content_hash(pdf):
+    """SHA-256 of a PDF path or upload, read in blocks so large files aren't copied into memory."""
+    digest = hashlib.sha256()
+    if hasattr(pdf, "read"):
+        pdf.seek(0)
+        for block in iter(lambda: pdf.read(1024 * 1024), b""):
+            digest.update(block)
+        pdf.seek(0)
+    else:
+        with open(pdf, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def source_key(source):
+    """Return a stable identity for a YouTube URL, website URL, PDF path or uploaded PDF."""
+    if hasattr(source, "read"):
+        return f"pdf:{pdf_content_hash(source)}"
+    source_type = detect_source_type(source)
+    if source_type == "youtube":
+        return f"youtube:{extract_video_id(source)}"
+    if source_type == "pdf":
+        return f"pdf:{pdf_content_hash(source)}"
+    return f"url:{canonical_url(source)}"
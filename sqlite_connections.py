@@ -0,0 +1,28 @@
+# Per-thread SQLite connections shared by the summary cache, the near-duplicate index and the job queue
+
+import sqlite3
+import threading
+
+
+class ThreadLocalConnections:
+    """Gives each thread its own WAL-mode connection to the database at ``path``.
+
+    sqlite3 connections may not be shared across threads, so each thread
+    keeps one; SQLite handles the locking between threads and processes.
+    ``synchronous`` optionally sets ``PRAGMA synchronous``, e.g. "NORMAL".
+    """
+
+    def __init__(self, path, synchronous=None):
+        self.path = path
+        self.synchronous = synchronous
+        self._local = threading.local()
+
+    def connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            if self.synchronous:
+                conn.execute(f"PRAGMA synchronous={self.synchronous}")
+            self._local.conn = conn
+        return conn
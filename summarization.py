@@ -0,0 +1,299 @@
+# Stuff, refine and chunked map-reduce summarization for documents of any size
+
+import os
+import threading
+import zlib
+from collections import OrderedDict
+from functools import lru_cache
+
+# LangChain is imported on first use, so front ends can import this module without paying for it
+from pipeline_events import PipelineTracker
+
+DEFAULT_CHUNK_TOKENS = 3000
+DEFAULT_CHUNK_OVERLAP_TOKENS = 100
+# Keep concurrent Groq calls low enough to stay inside the per-key rate limits
+DEFAULT_MAX_CONCURRENCY = int(os.environ.get("SUMMARY_MAX_CONCURRENCY", "4"))
+MAX_REDUCE_ROUNDS = 5
+MAX_CACHED_CHAINS = 256
+# Stable chunks may end after a paragraph whose hash is divisible by this, once they hold
+# MIN_STABLE_CHUNK_SHARE of the budget, so boundaries depend only on nearby content
+BOUNDARY_DIVISOR = 8
+MIN_STABLE_CHUNK_SHARE = 0.5
+
+MAP_TEMPLATE = """
+    Write a concise summary of the following section of a longer document.
+    Keep every key point, name and figure it contains:
+    Content: {text}
+    """
+
+REDUCE_TEMPLATE = """
+    The following are summaries of consecutive sections of one document.
+    Merge them into a single summary that keeps every key point, in order:
+    Content: {text}
+    """
+
+CHAPTER_TEMPLATE = """
+    Summarize the following part of a video transcript in two to four sentences.
+    Keep the key points, names and figures it contains:
+    Content: {text}
+    """
+
+# Wrapped in the style prompt for every refine step after the first
+REFINE_INPUT = """
+    Existing summary of the earlier parts of the document:
+    {summary}
+
+    Next part of the document:
+    {text}
+
+    Update the existing summary so that it also covers the next part.
+    """
+
+
+@lru_cache(maxsize=None)
+def _prompt(template):
+    from langchain.prompts import PromptTemplate
+
+    return PromptTemplate(template=template, input_variables=["text"])
+
+
+@lru_cache(maxsize=64)
+def build_prompt(summary_style, summary_length):
+    """Return the final summary prompt for the selected style and length.
+
+    Prompts are cached, so every request with the same settings shares one
+    template object and, through ``_chain``, one compiled chain per model client.
+    """
+    if summary_style == "Concise":
+        prompt_template = f"""
+        Provide a concise summary of the following content in {summary_length} words:
+        Content: {{text}}
+        """
+    elif summary_style == "Detailed":
+        prompt_template = f"""
+        Provide a detailed analysis and summary of the following content in {summary_length} words,
+        highlighting the key points, main arguments, and important details:
+        Content: {{text}}
+        """
+    else:  # Bullet Points
+        prompt_template = f"""
+        Summarize the following content in {summary_length} words using bullet points for clarity.
+        Focus on the most important information and organize it logically:
+        Content: {{text}}
+        """
+    return _prompt(prompt_template)
+
+
+_chains = OrderedDict()
+_chains_lock = threading.Lock()
+
+
+def _chain(prompt, llm):
+    # prompt | llm | parser, built once per prompt and client; the chain keeps both alive, so ids stay unique
+    key = (id(prompt), id(llm))
+    with _chains_lock:
+        chain = _chains.get(key)
+        if chain is None:
+            from langchain_core.output_parsers import StrOutputParser
+
+            chain = _chains[key] = prompt | llm | StrOutputParser()
+            if len(_chains) > MAX_CACHED_CHAINS:
+                _chains.popitem(last=False)
+        else:
+            _chains.move_to_end(key)
+    return chain
+
+
+def estimate_tokens(text):
+    # Roughly four characters per token for English text; cheap and dependency-free
+    return len(text) // 4 + 1
+
+
+def split_documents(docs, chunk_tokens=DEFAULT_CHUNK_TOKENS, overlap_tokens=DEFAULT_CHUNK_OVERLAP_TOKENS):
+    """Split ``docs`` into chunks of at most ``chunk_tokens`` estimated tokens."""
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_tokens,
+        chunk_overlap=overlap_tokens,
+        length_function=estimate_tokens,
+    )
+    return splitter.split_documents(docs)
+
+
+def split_stable(docs, chunk_tokens=DEFAULT_CHUNK_TOKENS):
+    """Split ``docs`` into paragraph-aligned chunks that survive edits elsewhere in the text.
+
+    Boundaries are content-defined: a chunk ends after a paragraph whose crc32
+    hits BOUNDARY_DIVISOR (once the chunk is half full) or before a paragraph
+    that would overflow it. Changing one paragraph therefore changes only the
+    chunk around it, and the rest keep their text and memoized summaries.
+    """
+    from langchain.schema import Document
+
+    paragraphs = []
+    for doc in docs:
+        for paragraph in doc.page_content.split("\n\n"):
+            paragraph = paragraph.strip()
+            if estimate_tokens(paragraph) > chunk_tokens:
+                # A single oversized paragraph is split on its own, deterministically
+                paragraphs.extend(chunk.page_content for chunk in split_documents(
+                    [Document(page_content=paragraph)], chunk_tokens=chunk_tokens, overlap_tokens=0))
+            elif paragraph:
+                paragraphs.append(paragraph)
+
+    metadata = dict(docs[0].metadata) if docs else {}
+    chunks, current, current_tokens = [], [], 0
+    for paragraph in paragraphs:
+        tokens = estimate_tokens(paragraph)
+        if current and current_tokens + tokens > chunk_tokens:
+            chunks.append(current)
+            current, current_tokens = [], 0
+        current.append(paragraph)
+        current_tokens += tokens
+        if current_tokens >= chunk_tokens * MIN_STABLE_CHUNK_SHARE and zlib.crc32(paragraph.encode("utf-8")) % BOUNDARY_DIVISOR == 0:
+            chunks.append(current)
+            current, current_tokens = [], 0
+    if current:
+        chunks.append(current)
+    return [Document(page_content="\n\n".join(chunk), metadata=metadata) for chunk in chunks]
+
+
+def _batch_memoized(chain, texts, config, memo, stage):
+    # Run ``chain`` only for texts without a memoized result; returns (outputs, reused count)
+    outputs = [memo.get(stage, text) for text in texts] if memo is not None else [None] * len(texts)
+    missing = [i for i, output in enumerate(outputs) if output is None]
+    if missing:
+        results = chain.batch([{"text": texts[i]} for i in missing], config=config)
+        for i, result in zip(missing, results):
+            outputs[i] = result
+            if memo is not None:
+                memo.set(stage, texts[i], result)
+    return outputs, len(texts) - len(missing)
+
+
+def _group_by_budget(texts, token_budget):
+    # Pack consecutive texts into groups whose combined size stays within the budget
+    groups, current, current_tokens = [], [], 0
+    for text in texts:
+        tokens = estimate_tokens(text)
+        if current and current_tokens + tokens > token_budget:
+            groups.append(current)
+            current, current_tokens = [], 0
+        current.append(text)
+        current_tokens += tokens
+    if current:
+        groups.append(current)
+    return groups
+
+
+def _reduce_to_final_input(llm, docs, chunk_tokens, max_concurrency, tracker, memo=None):
+    # Run the map and reduce phases and return the text the final prompt is applied to
+    with tracker.stage("chunk") as record:
+        # Memoized runs need chunks that stay put when the text around them changes
+        chunks = split_stable(docs, chunk_tokens) if memo is not None else split_documents(docs, chunk_tokens=chunk_tokens)
+        record.tokens = sum(estimate_tokens(chunk.page_content) for chunk in chunks)
+    if len(chunks) <= 1:
+        return "\n\n".join(doc.page_content for doc in docs)
+
+    config = {"max_concurrency": max_concurrency}
+    map_chain = _chain(_prompt(MAP_TEMPLATE), llm)
+    with tracker.stage("llm", f"map x{len(chunks)}") as record:
+        summaries, reused = _batch_memoized(map_chain, [chunk.page_content for chunk in chunks], config, memo, "map")
+        record.tokens = sum(map(estimate_tokens, summaries))
+    if memo is not None:
+        tracker.note("reused_chunks", f"{reused}/{len(chunks)}")
+
+    # Hierarchical reduce: merge neighbouring summaries until they fit a single call
+    reduce_chain = _chain(_prompt(REDUCE_TEMPLATE), llm)
+    rounds = 0
+    while len(summaries) > 1 and sum(map(estimate_tokens, summaries)) > chunk_tokens and rounds < MAX_REDUCE_ROUNDS:
+        groups = _group_by_budget(summaries, chunk_tokens)
+        with tracker.stage("llm", f"reduce x{len(groups)}") as record:
+            summaries, _ = _batch_memoized(reduce_chain, ["\n\n".join(group) for group in groups], config, memo, "reduce")
+            record.tokens = sum(map(estimate_tokens, summaries))
+        rounds += 1
+
+    return "\n\n".join(summaries)
+
+
+def summarize_sections(llm, texts, max_concurrency=DEFAULT_MAX_CONCURRENCY, tracker=None, memo=None):
+    """Summarize each of ``texts`` on its own, concurrently; returns the summaries in order.
+
+    Used for transcript chapters, whose summaries are shown individually.
+    With a ``memo`` only sections not summarized before go to the LLM.
+    """
+    tracker = tracker or PipelineTracker()
+    chain = _chain(_prompt(CHAPTER_TEMPLATE), llm)
+    with tracker.stage("llm", f"chapters x{len(texts)}") as record:
+        summaries, reused = _batch_memoized(chain, texts, {"max_concurrency": max_concurrency}, memo, "chapter")
+        record.tokens = sum(map(estimate_tokens, summaries))
+    if memo is not None:
+        tracker.note("reused_chapters", f"{reused}/{len(texts)}")
+    return summaries
+
+
+def _refine_to_final_input(llm, docs, prompt, chunk_tokens, tracker):
+    # Summarize chunk by chunk, folding each into the running summary, and
+    # return the input of the last step so the caller can invoke or stream it
+    with tracker.stage("chunk") as record:
+        chunks = split_documents(docs, chunk_tokens=chunk_tokens)
+        record.tokens = sum(estimate_tokens(chunk.page_content) for chunk in chunks)
+
+    step_chain = _chain(prompt, llm)
+    text = chunks[0].page_content if chunks else ""
+    for step, chunk in enumerate(chunks[1:], start=1):
+        with tracker.stage("llm", f"refine {step}/{len(chunks)}") as record:
+            summary = step_chain.invoke({"text": text})
+            record.tokens = estimate_tokens(summary)
+        text = REFINE_INPUT.format(summary=summary, text=chunk.page_content)
+    return text
+
+
+def _final_input(llm, docs, prompt, plan, max_concurrency, tracker, memo=None):
+    strategy = plan.strategy if plan else "map_reduce"
+    chunk_tokens = plan.chunk_tokens if plan else DEFAULT_CHUNK_TOKENS
+    if strategy == "stuff":
+        return "\n\n".join(doc.page_content for doc in docs)
+    if strategy == "refine":
+        return _refine_to_final_input(llm, docs, prompt, chunk_tokens, tracker)
+    return _reduce_to_final_input(llm, docs, chunk_tokens, max_concurrency, tracker, memo)
+
+
+def summarize(llm, docs, prompt, plan=None, max_concurrency=DEFAULT_MAX_CONCURRENCY, tracker=None, memo=None):
+    """Summarize ``docs`` following ``plan`` and return the summary text.
+
+    ``plan`` (see chain_planner.plan_summary) selects "stuff", "refine" or
+    "map_reduce" and the chunk size; without one, map-reduce over
+    DEFAULT_CHUNK_TOKENS chunks is used. Map-reduce summarizes chunks
+    concurrently (at most ``max_concurrency`` LLM calls at a time) and merges
+    the partial summaries in rounds until they fit one call, then ``prompt``
+    produces the final summary.
+
+    With a ``memo`` (see summary_cache.PartialSummaryMemo) map-reduce splits on
+    stable boundaries, and only chunks whose text changed since an earlier run
+    go to the LLM. Merge calls whose inputs are unchanged are reused too; the
+    final call always runs.
+    """
+    tracker = tracker or PipelineTracker()
+    text = _final_input(llm, docs, prompt, plan, max_concurrency, tracker, memo)
+    final_chain = _chain(prompt, llm)
+    with tracker.stage("llm", "final") as record:
+        summary = final_chain.invoke({"text": text})
+        record.tokens = estimate_tokens(summary)
+    return summary
+
+
+def stream_summary(llm, docs, prompt, plan=None, max_concurrency=DEFAULT_MAX_CONCURRENCY, tracker=None, memo=None):
+    """Yield the final summary token by token as the model generates it.
+
+    Chunk summaries and refine steps run first (they are not shown to the user)
+    and only the last call is streamed.
+    """
+    tracker = tracker or PipelineTracker()
+    text = _final_input(llm, docs, prompt, plan, max_concurrency, tracker, memo)
+    final_chain = _chain(prompt, llm)
+    with tracker.stage("llm", "final") as record:
+        for token in final_chain.stream({"text": text}):
+            record.tokens += 1
+            yield token
@@ -0,0 +1,119 @@
+# Disk-backed summary cache shared by every Streamlit session and worker process
+
+import hashlib
+import json
+import os
+import time
+
+from sqlite_connections import ThreadLocalConnections
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "content-summarizer")
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024  # 256 MB of stored summaries
+DEFAULT_TTL_SECONDS = 7 * 24 * 60 * 60  # one week
+
+
+def make_cache_key(source_text, model, **prompt_params):
+    """Hash the extracted source text together with the model and prompt parameters."""
+    digest = hashlib.sha256()
+    digest.update(source_text.encode("utf-8", errors="replace"))
+    digest.update(b"\0")
+    digest.update(model.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(json.dumps(prompt_params, sort_keys=True, default=str).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class SummaryCache:
+    """SQLite store of finished summaries with TTL expiry and LRU eviction by total size.
+
+    SQLite handles the locking between processes, so one file on disk is shared by
+    every session of every worker pointed at the same cache directory.
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=None, ttl_seconds=None):
+        cache_dir = cache_dir or os.environ.get("SUMMARY_CACHE_DIR", DEFAULT_CACHE_DIR)
+        os.makedirs(cache_dir, exist_ok=True)
+        self.path = os.path.join(cache_dir, "summaries.sqlite3")
+        self.max_bytes = int(max_bytes or os.environ.get("SUMMARY_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES))
+        self.ttl_seconds = int(ttl_seconds or os.environ.get("SUMMARY_CACHE_TTL", DEFAULT_TTL_SECONDS))
+        self._db = ThreadLocalConnections(self.path, synchronous="NORMAL")
+        with self._db.connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS summaries (
+                    key TEXT PRIMARY KEY,
+                    summary TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_summaries_accessed ON summaries (accessed_at)")
+
+    def get(self, key):
+        """Return the cached summary for ``key``, or None if missing or expired."""
+        now = time.time()
+        with self._db.connect() as conn:
+            row = conn.execute("SELECT summary, created_at FROM summaries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            summary, created_at = row
+            if now - created_at > self.ttl_seconds:
+                conn.execute("DELETE FROM summaries WHERE key = ?", (key,))
+                return None
+            conn.execute("UPDATE summaries SET accessed_at = ? WHERE key = ?", (now, key))
+        return summary
+
+    def set(self, key, summary):
+        """Store ``summary`` under ``key`` and evict entries until the cache fits its limits."""
+        now = time.time()
+        size = len(summary.encode("utf-8"))
+        with self._db.connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO summaries (key, summary, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, summary, size, now, now),
+            )
+            self._evict(conn, now)
+
+    def _evict(self, conn, now):
+        conn.execute("DELETE FROM summaries WHERE created_at < ?", (now - self.ttl_seconds,))
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM summaries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Drop the least recently used entries until we are back under the size limit
+        stale = []
+        for key, size in conn.execute("SELECT key, size FROM summaries ORDER BY accessed_at ASC").fetchall():
+            if total <= self.max_bytes:
+                break
+            stale.append((key,))
+            total -= size
+        conn.executemany("DELETE FROM summaries WHERE key = ?", stale)
+
+    def clear(self):
+        with self._db.connect() as conn:
+            conn.execute("DELETE FROM summaries")
+
+
+class PartialSummaryMemo:
+    """Chunk and merge summaries of map-reduce runs, stored in a SummaryCache.
+
+    Entries are keyed by the exact chunk text, the model and the phase, so a
+    chunk that reappears unchanged in a later version of a page is not sent to
+    the LLM again. ``answered`` is the set of an llm_clients.answering_models
+    block; once another model than ``model`` has answered, nothing more is
+    stored, since the results may be that model's.
+    """
+
+    def __init__(self, cache, model, answered=None):
+        self.cache = cache
+        self.model = model
+        self.answered = answered
+
+    def get(self, stage, text):
+        return self.cache.get(make_cache_key(text, self.model, stage=stage))
+
+    def set(self, stage, text, summary):
+        if self.answered and self.answered - {self.model}:
+            return
+        self.cache.set(make_cache_key(text, self.model, stage=stage), summary)
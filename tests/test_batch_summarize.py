@@ -0,0 +1,40 @@
+# Resuming batch_summarize output files left by interrupted runs
+
+import json
+
+import pytest
+
+pytest.importorskip("langchain_groq")
+
+from batch_summarize import drop_partial_line, read_completed
+
+
+def record(source):
+    return json.dumps({"source": source, "model": "m", "summary_style": "Concise", "summary_length": 300,
+                       "summary": "text"}) + "\n"
+
+
+def test_records_appended_after_a_cut_short_line_are_read(tmp_path):
+    path = tmp_path / "summaries.jsonl"
+    path.write_text(record("a") + record("b")[:25], encoding="utf-8")
+    drop_partial_line(str(path))
+    with open(path, "a", encoding="utf-8") as out:
+        out.write(record("c"))
+    assert path.read_text(encoding="utf-8") == record("a") + record("c")
+    assert read_completed(str(path)) == {("a", "m", "Concise", 300), ("c", "m", "Concise", 300)}
+
+
+def test_complete_files_are_left_alone(tmp_path):
+    path = tmp_path / "summaries.jsonl"
+    path.write_text(record("a"), encoding="utf-8")
+    drop_partial_line(str(path))
+    assert path.read_text(encoding="utf-8") == record("a")
+    drop_partial_line(str(tmp_path / "missing.jsonl"))
+    assert not (tmp_path / "missing.jsonl").exists()
+
+
+def test_a_single_cut_short_line_is_dropped(tmp_path):
+    path = tmp_path / "summaries.jsonl"
+    path.write_text(record("a")[:25], encoding="utf-8")
+    drop_partial_line(str(path))
+    assert path.read_text(encoding="utf-8") == ""
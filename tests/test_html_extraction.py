@@ -0,0 +1,31 @@
+# Boilerplate removal of html_extraction.extract_main_text on saved pages
+
+import os
+
+from html_extraction import extract_main_text
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks", "fixtures", "html")
+
+
+def fixture(name):
+    with open(os.path.join(FIXTURE_DIR, name), encoding="utf-8") as f:
+        return f.read()
+
+
+def test_article_header_keeps_the_headline():
+    text = extract_main_text(fixture("feature_article.html"))
+    assert text.startswith("How Night Trains Made a Comeback in Europe\n\nSleeper services")
+    assert "By Jonas Becker" in text
+
+
+def test_page_chrome_and_marked_footers_are_dropped():
+    text = extract_main_text(fixture("feature_article.html"))
+    for boilerplate in ("Field Notes", "Climate", "Share", "Privacy"):
+        assert boilerplate not in text
+    assert text.endswith("only a few manufacturers make them.")
+
+
+def test_site_header_and_footer_outside_the_article_are_dropped():
+    text = extract_main_text(fixture("news_article.html"))
+    assert text.startswith("City Council Approves Expanded Bike Lane Network")
+    assert "All rights reserved" not in text
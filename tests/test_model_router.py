@@ -0,0 +1,141 @@
+# Retries, hedging and fallback of model_router.ModelRouter against local fake models
+
+import time
+import uuid
+
+import pytest
+
+pytest.importorskip("langchain_core")
+
+from llm_clients import answering_models
+from model_router import ModelRouter, routed_llm
+from pipeline import summarize_docs
+from pipeline_events import PipelineTracker
+from summary_cache import SummaryCache
+
+
+class FakeError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+class FakeModel:
+    """Answers with its name after ``delay`` seconds; raises the queued errors first, one per call."""
+
+    def __init__(self, name, delay=0.0, errors=()):
+        self.name = name
+        self.delay = delay
+        self.errors = list(errors)
+        self.calls = 0
+
+    def _next(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        time.sleep(self.delay)
+
+    def invoke(self, input, config=None, **kwargs):
+        self._next()
+        return self.name
+
+    def stream(self, input, config=None, **kwargs):
+        self._next()
+        yield from self.name
+
+
+def make_router(primary, secondary, **kwargs):
+    # Latency and error stats are shared per model name, so every test gets fresh names
+    names = [f"{model.name}-{uuid.uuid4().hex}" for model in (primary, secondary)]
+    kwargs.setdefault("sleep", lambda seconds: None)
+    return ModelRouter(dict(zip(names, (primary, secondary))), names[0], **kwargs)
+
+
+def test_retries_rate_limited_primary():
+    primary, secondary = FakeModel("primary", errors=[FakeError(429)]), FakeModel("secondary")
+    assert make_router(primary, secondary).invoke("text") == "primary"
+    assert (primary.calls, secondary.calls) == (2, 0)
+
+
+def test_falls_back_once_retries_are_exhausted():
+    primary, secondary = FakeModel("primary", errors=[FakeError(503)] * 3), FakeModel("secondary")
+    assert make_router(primary, secondary, max_retries=2).invoke("text") == "secondary"
+    assert primary.calls == 3
+
+
+def test_does_not_fall_back_on_rejected_key():
+    primary, secondary = FakeModel("primary", errors=[FakeError(401)]), FakeModel("secondary")
+    with pytest.raises(FakeError):
+        make_router(primary, secondary).invoke("text")
+    assert secondary.calls == 0
+
+
+def test_rejected_key_does_not_demote_the_primary():
+    primary, secondary = FakeModel("primary", errors=[FakeError(401)] * 6), FakeModel("secondary")
+    router = make_router(primary, secondary, key_id="bad")
+    for _ in range(6):
+        with pytest.raises(FakeError):
+            router.invoke("text")
+    other = ModelRouter(router.clients, router.primary, key_id="good")
+    assert other._candidates("text")[0] == router.primary
+    assert other.invoke("text") == "primary"
+
+
+def test_rate_limits_demote_the_primary_for_that_key_only():
+    primary, secondary = FakeModel("primary", errors=[FakeError(429)] * 6), FakeModel("secondary")
+    router = make_router(primary, secondary, max_retries=0, key_id="busy")
+    for _ in range(6):
+        assert router.invoke("text") == "secondary"
+    assert router._candidates("text")[0] != router.primary
+    other = ModelRouter(router.clients, router.primary, key_id="idle")
+    assert other._candidates("text")[0] == router.primary
+
+
+def test_hedges_slow_primary():
+    primary, secondary = FakeModel("primary", delay=2.0), FakeModel("secondary")
+    started = time.perf_counter()
+    assert make_router(primary, secondary, default_hedge_seconds=0.1).invoke("text") == "secondary"
+    assert time.perf_counter() - started < 1.0
+
+
+def test_no_hedge_when_disabled():
+    primary, secondary = FakeModel("primary", delay=0.3), FakeModel("secondary")
+    assert make_router(primary, secondary, hedge=False, default_hedge_seconds=0.05).invoke("text") == "primary"
+    assert secondary.calls == 0
+
+
+def test_stream_falls_back_before_first_chunk():
+    primary, secondary = FakeModel("primary", errors=[FakeError(500)]), FakeModel("secondary")
+    assert "".join(make_router(primary, secondary, max_retries=0).stream("text")) == "secondary"
+
+
+def test_routers_are_shared_per_key_and_primary():
+    pytest.importorskip("langchain_groq")
+    router = routed_llm("gsk_test_a", "llama3-70b-8192")
+    assert routed_llm("gsk_test_a", "llama3-70b-8192") is router
+    assert routed_llm("gsk_test_b", "llama3-70b-8192") is not router
+    assert routed_llm("gsk_test_a", "mixtral-8x7b-32768") is not router
+
+
+def test_reports_the_answering_model():
+    primary, secondary = FakeModel("primary", errors=[FakeError(503)]), FakeModel("secondary")
+    router = make_router(primary, secondary, max_retries=0)
+    with answering_models() as answered:
+        router.invoke("text")
+    assert answered == {name for name in router.clients if name.startswith("secondary")}
+
+
+def test_fallback_summaries_are_not_cached(tmp_path):
+    pytest.importorskip("langchain")
+    from langchain.schema import Document
+
+    primary, secondary = FakeModel("primary", errors=[FakeError(503)]), FakeModel("secondary")
+    router = make_router(primary, secondary, max_retries=0)
+    cache, docs = SummaryCache(str(tmp_path)), [Document(page_content="Some text to summarize.")]
+    tracker = PipelineTracker()
+    summary, _ = summarize_docs(docs, router, router.primary, "Concise", 100, summary_cache=cache, tracker=tracker)
+    assert summary == "secondary"
+    assert tracker.notes["answered_by"] == [name for name in router.clients if name.startswith("secondary")]
+    # Nothing was stored under the primary, so the next request asks it again and caches its own answer
+    assert summarize_docs(docs, router, router.primary, "Concise", 100, summary_cache=cache) == ("primary", False)
+    assert summarize_docs(docs, router, router.primary, "Concise", 100, summary_cache=cache) == ("primary", True)
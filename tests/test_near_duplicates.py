@@ -0,0 +1,71 @@
+# Near-duplicate reuse of near_duplicates.NearDuplicateIndex, alone and inside the pipeline
+
+import random
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("langchain")
+
+from langchain_core.runnables import RunnableLambda
+
+from near_duplicates import NearDuplicateIndex
+from pipeline import summarize_source
+from source_cache import FileSystemBackend, SourceCache
+from summary_cache import SummaryCache
+
+WORDS = [f"word{i}" for i in range(2000)]
+
+
+def article(paragraphs=40, seed=0):
+    rng = random.Random(seed)
+    return "\n\n".join(" ".join(rng.choice(WORDS) for _ in range(80)) + "." for _ in range(paragraphs))
+
+
+class CountingLLM:
+    def __init__(self):
+        self.calls = 0
+        self.runnable = RunnableLambda(self._answer)
+
+    def _answer(self, prompt):
+        self.calls += 1
+        return f"summary {self.calls}"
+
+
+def test_matches_only_other_sources(tmp_path):
+    index = NearDuplicateIndex(str(tmp_path))
+    text = article()
+    index.add(text, "the summary", "model", source_key="url:https://example.com/a")
+    assert index.find(text, "model", source_key="url:https://example.com/a") is None
+    assert index.find(text, "model", source_key="url:https://mirror.example.org/a")[0] == "the summary"
+    assert index.find(text, "other-model", source_key="url:https://mirror.example.org/a") is None
+
+
+def test_updated_page_is_summarized_again_but_mirrors_reuse(tmp_path):
+    pages = {"https://example.com/live": article()}
+    source_cache = SourceCache(backend=FileSystemBackend(str(tmp_path / "sources")), ttls={"website": 0},
+                               fetch_page=lambda url, etag=None, last_modified=None: (200, pages[url], None, None),
+                               parse_html=lambda html: html)
+    options = dict(source_cache=source_cache, summary_cache=SummaryCache(str(tmp_path)),
+                   near_duplicates=NearDuplicateIndex(str(tmp_path)))
+    llm = CountingLLM()
+
+    def run(url):
+        calls = llm.calls
+        result = summarize_source(url, llm.runnable, "llama3-70b-8192", "Concise", 100, **options)
+        return result, llm.calls - calls
+
+    first, calls = run("https://example.com/live")
+    assert calls > 0 and first["near_duplicate"] is None
+
+    # One new paragraph keeps the page above the similarity threshold, yet it must be summarized again
+    pages["https://example.com/live"] += "\n\nBREAKING update: " + article(paragraphs=1, seed=1)
+    updated, calls = run("https://example.com/live")
+    assert calls > 0
+    assert updated["near_duplicate"] is None and not updated["cached"]
+
+    # The same text under another address is a mirror, so its summary is reused
+    pages["https://mirror.example.org/live"] = pages["https://example.com/live"] + "\n\nMirrored from example.com."
+    mirrored, calls = run("https://mirror.example.org/live")
+    assert calls == 0
+    assert mirrored["near_duplicate"] is not None and mirrored["summary"] == updated["summary"]
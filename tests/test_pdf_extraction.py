@@ -0,0 +1,57 @@
+# Page selection and process-pool recovery of pdf_extraction against generated PDFs
+
+import os
+import signal
+
+import pytest
+
+import pdf_extraction
+from pdf_extraction import PARALLEL_MIN_PAGES, extract_pdf_text, iter_pdf_pages, parse_page_ranges
+
+
+def make_pdf(path, page_count):
+    fitz = pytest.importorskip("fitz")
+    with fitz.open() as doc:
+        for number in range(1, page_count + 1):
+            doc.new_page().insert_text((72, 72), f"Page {number}")
+        doc.save(path)
+    return str(path)
+
+
+def page_numbers(source, **kwargs):
+    return [(number, text.strip()) for number, text in iter_pdf_pages(source, **kwargs)]
+
+
+def test_parse_page_ranges():
+    assert parse_page_ranges("", 4) == [0, 1, 2, 3]
+    assert parse_page_ranges("1-2, 4, 3-", 10) == [0, 1, 2, 3, 4, 5, 6, 7, 8, 9]
+    assert parse_page_ranges("2, 9-", 10) == [1, 8, 9]
+    with pytest.raises(ValueError):
+        parse_page_ranges("3-1", 10)
+
+
+def test_parallel_extraction_keeps_page_order(tmp_path):
+    path = make_pdf(tmp_path / "long.pdf", PARALLEL_MIN_PAGES)
+    pages = page_numbers(path, max_workers=2)
+    assert pages == [(number, f"Page {number}") for number in range(1, PARALLEL_MIN_PAGES + 1)]
+
+
+def test_pool_is_replaced_after_a_worker_dies(tmp_path):
+    path = make_pdf(tmp_path / "long.pdf", PARALLEL_MIN_PAGES)
+    expected = extract_pdf_text(path, max_workers=2)
+    pool = pdf_extraction._pool
+    # One dead worker breaks the whole pool, and the executor then stops the others itself
+    process = next(iter(pool._processes.values()))
+    os.kill(process.pid, signal.SIGKILL)
+    process.join()
+    assert extract_pdf_text(path, max_workers=2) == expected
+    assert pdf_extraction._pool is not pool
+    assert extract_pdf_text(path, max_workers=2) == expected
+
+
+def test_pool_follows_the_requested_worker_count(tmp_path):
+    path = make_pdf(tmp_path / "long.pdf", PARALLEL_MIN_PAGES)
+    expected = extract_pdf_text(path, max_workers=2)
+    assert pdf_extraction._pool._max_workers == 2
+    assert extract_pdf_text(path, max_workers=3) == expected
+    assert pdf_extraction._pool._max_workers == 3
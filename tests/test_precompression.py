@@ -0,0 +1,59 @@
+# Pre-compression of chaptered transcripts with precompression.compress_documents
+
+import random
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("langchain")
+
+from langchain.schema import Document
+
+from chapters import split_chapters
+from pipeline_events import PipelineTracker
+from precompression import MIN_COMPRESS_TOKENS, compress_documents
+from summarization import estimate_tokens
+
+# Made-up words of English length, so token estimates match real speech
+_rng = random.Random(42)
+WORDS = ["".join(_rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(_rng.randint(2, 7))) for _ in range(600)]
+SIGN_OFF = "Remember to like and subscribe to the channel for more videos like this one."
+
+
+def talk(minutes=60, words_per_minute=130, seed=0):
+    """Caption segments of a talk at a realistic speaking rate, repeating a sign-off every few minutes."""
+    rng = random.Random(seed)
+    segments, start = [], 0.0
+    while start < minutes * 60:
+        text = SIGN_OFF if rng.random() < 0.03 else " ".join(rng.choice(WORDS) for _ in range(12)) + "."
+        duration = len(text.split()) * 60 / words_per_minute
+        segments.append({"text": text, "start": start, "duration": duration})
+        start += duration
+    return segments
+
+
+def chapter_docs(segments):
+    return [Document(page_content=chapter["text"], metadata={"start": chapter["start"], "end": chapter["end"]})
+            for chapter in split_chapters(segments)]
+
+
+def test_chapters_are_compressed_together():
+    docs = chapter_docs(talk())
+    # Every chapter alone is below the threshold, as with most real videos
+    assert len(docs) == 6
+    assert all(estimate_tokens(doc.page_content) < MIN_COMPRESS_TOKENS for doc in docs)
+
+    tracker = PipelineTracker()
+    compressed = compress_documents(docs, 0.35, tracker)
+    assert tracker.notes["compression_ratio"] < 0.5
+    assert [doc.metadata["start"] for doc in compressed] == [doc.metadata["start"] for doc in docs]
+    assert all(doc.page_content for doc in compressed)
+    # The repeated sign-off is a near-duplicate across chapters, so at most one copy survives
+    assert sum(doc.page_content.count(SIGN_OFF) for doc in compressed) <= 1
+
+
+def test_short_transcripts_are_left_alone():
+    docs = chapter_docs(talk(minutes=5))
+    tracker = PipelineTracker()
+    assert [doc.page_content for doc in compress_documents(docs, 0.35, tracker)] == [doc.page_content for doc in docs]
+    assert tracker.notes["compression_ratio"] == 1.0
@@ -0,0 +1,106 @@
+# Coalescing of single_flight.SingleFlight and FileLockBackend with local stand-in computations
+
+import threading
+import time
+
+import pytest
+
+from single_flight import FileLockBackend, SingleFlight
+
+
+class Interrupted(BaseException):
+    """Stands in for Streamlit's RerunException and StopException."""
+
+
+class Computation:
+    """Blocks until ``release`` is set, then returns ``result`` or raises the queued errors, one per call."""
+
+    def __init__(self, result="summary", errors=()):
+        self.result = result
+        self.errors = list(errors)
+        self.release = threading.Event()
+        self.started = threading.Event()
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        self.started.set()
+        self.release.wait(5)
+        if self.errors:
+            raise self.errors.pop(0)
+        return self.result
+
+
+def run_in_thread(func, *args):
+    outcome = {}
+
+    def target():
+        try:
+            outcome["result"] = func(*args)
+        except BaseException as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=target)
+    thread.start()
+    return thread, outcome
+
+
+def follow(flight, key, computation):
+    # Start a leader on ``computation`` and a follower waiting for it
+    leader, leader_outcome = run_in_thread(flight.do, key, computation)
+    assert computation.started.wait(5)
+    follower, follower_outcome = run_in_thread(flight.do, key, computation)
+    time.sleep(0.05)
+    computation.release.set()
+    leader.join(5)
+    follower.join(5)
+    return leader_outcome, follower_outcome
+
+
+def test_concurrent_callers_share_one_computation():
+    computation = Computation()
+    leader, follower = follow(SingleFlight(), "key", computation)
+    assert leader == follower == {"result": "summary"}
+    assert computation.calls == 1
+
+
+def test_followers_get_the_leaders_error():
+    error = ValueError("bad request")
+    computation = Computation(errors=[error])
+    leader, follower = follow(SingleFlight(), "key", computation)
+    assert leader["error"] is error and follower["error"] is error
+    assert computation.calls == 1
+
+
+def test_interrupted_leader_hands_over_to_a_follower():
+    computation = Computation(errors=[Interrupted()])
+    leader, follower = follow(SingleFlight(), "key", computation)
+    assert isinstance(leader["error"], Interrupted)
+    assert follower == {"result": "summary"}
+    assert computation.calls == 2
+
+
+def test_different_keys_are_not_coalesced():
+    flight = SingleFlight()
+    assert flight.do("a", lambda: 1) == 1
+    assert flight.do("b", lambda: 2) == 2
+    assert flight._calls == {}
+
+
+def test_file_lock_backend_shares_a_result_across_instances(tmp_path):
+    pytest.importorskip("fcntl")
+    computation = Computation()
+    # Two SingleFlights on one directory stand in for two server processes
+    first, second = SingleFlight(FileLockBackend(str(tmp_path))), SingleFlight(FileLockBackend(str(tmp_path)))
+    leader, leader_outcome = run_in_thread(first.do, "key", computation)
+    assert computation.started.wait(5)
+    follower, follower_outcome = run_in_thread(second.do, "key", computation)
+    time.sleep(0.05)
+    computation.release.set()
+    leader.join(5)
+    follower.join(5)
+    assert leader_outcome == follower_outcome == {"result": "summary"}
+    assert computation.calls == 1
+    # A later call computes afresh instead of reading the old result
+    assert second.do("key", computation) == "summary"
+    assert computation.calls == 2
@@ -0,0 +1,190 @@
+# Revalidation, TTLs and storage of source_cache.SourceCache against local stand-in fetchers
+
+import json
+import os
+import time
+
+import pytest
+
+import source_cache
+from source_cache import FileSystemBackend, SourceCache, fetch_page
+
+
+class MemoryBackend:
+    def __init__(self):
+        self.entries = {}
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        return dict(entry) if entry is not None else None
+
+    def set(self, key, entry):
+        self.entries[key] = dict(entry)
+
+
+class FakeOrigin:
+    """Serves ``html`` with an ETag; answers 304 to a request that sends the current one."""
+
+    def __init__(self, html="<p>first</p>", etag='"v1"'):
+        self.html = html
+        self.etag = etag
+        self.requests = []
+
+    def fetch_page(self, url, etag=None, last_modified=None):
+        self.requests.append(etag)
+        if etag == self.etag:
+            return 304, "", self.etag, None
+        return 200, self.html, self.etag, None
+
+
+class FakeParser:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, html):
+        self.calls += 1
+        return html.replace("<p>", "").replace("</p>", "")
+
+
+def make_cache(origin, parser, **kwargs):
+    return SourceCache(backend=MemoryBackend(), fetch_page=origin.fetch_page, parse_html=parser, **kwargs)
+
+
+def expire(cache, key):
+    entry = cache.backend.entries[key]
+    entry["fetched_at"] -= cache.ttls[key.split(":", 1)[0]] + 1
+
+
+def test_fresh_page_is_served_without_a_request():
+    origin, parser = FakeOrigin(), FakeParser()
+    cache = make_cache(origin, parser)
+    assert cache.get_page_text("https://example.com") == "first"
+    assert cache.get_page_text("https://example.com") == "first"
+    assert (origin.requests, parser.calls) == ([None], 1)
+
+
+def test_not_modified_keeps_the_text_and_restarts_the_ttl():
+    origin, parser = FakeOrigin(), FakeParser()
+    cache = make_cache(origin, parser)
+    cache.get_page_text("https://example.com")
+    expire(cache, "website:https://example.com")
+    assert cache.get_page_text("https://example.com") == "first"
+    assert origin.requests == [None, '"v1"']
+    assert parser.calls == 1
+    # Fresh again after the 304, so the next call asks nobody
+    assert cache.get_page_text("https://example.com") == "first"
+    assert len(origin.requests) == 2
+
+
+def test_changed_page_is_parsed_again():
+    origin, parser = FakeOrigin(), FakeParser()
+    cache = make_cache(origin, parser)
+    cache.get_page_text("https://example.com")
+    origin.html, origin.etag = "<p>second</p>", '"v2"'
+    expire(cache, "website:https://example.com")
+    assert cache.get_page_text("https://example.com") == "second"
+    assert parser.calls == 2
+    assert cache.backend.entries["website:https://example.com"]["etag"] == '"v2"'
+
+
+def test_ttls_are_per_source_type():
+    origin, parser, fetched = FakeOrigin(), FakeParser(), []
+
+    def fetch_transcript(video_id, languages):
+        fetched.append(video_id)
+        return [{"text": "hello", "start": 0.0, "duration": 1.0}], "en"
+
+    cache = SourceCache(backend=MemoryBackend(), ttls={"website": 0}, fetch_transcript=fetch_transcript,
+                        fetch_page=origin.fetch_page, parse_html=parser)
+    cache.get_page_text("https://example.com")
+    cache.get_page_text("https://example.com")
+    cache.get_transcript("dQw4w9WgXcQ")
+    cache.get_transcript("dQw4w9WgXcQ")
+    # The page expires at once and is revalidated; the transcript keeps its default week
+    assert len(origin.requests) == 2
+    assert fetched == ["dQw4w9WgXcQ"]
+
+
+def test_transcripts_are_keyed_by_language_preference():
+    fetched = []
+
+    def fetch_transcript(video_id, languages):
+        fetched.append(languages)
+        return [{"text": languages[0], "start": 0.0, "duration": 1.0}], languages[0]
+
+    cache = SourceCache(backend=MemoryBackend(), fetch_transcript=fetch_transcript)
+    assert cache.get_transcript("dQw4w9WgXcQ", ("en",))[1] == "en"
+    assert cache.get_transcript("dQw4w9WgXcQ", ("de", "en"))[1] == "de"
+    assert cache.get_transcript("dQw4w9WgXcQ", ("en",))[1] == "en"
+    assert fetched == [("en",), ("de", "en")]
+
+
+def test_has_page_text_only_after_a_fetch():
+    cache = make_cache(FakeOrigin(), FakeParser())
+    assert not cache.has_page_text("https://example.com")
+    cache.get_page_text("https://example.com")
+    assert cache.has_page_text("https://example.com")
+
+
+class FakeResponse:
+    def __init__(self, content, content_type, apparent_encoding=None):
+        self.status_code = 200
+        self.content = content
+        self.headers = {"Content-Type": content_type}
+        self.apparent_encoding = apparent_encoding
+
+    def raise_for_status(self):
+        pass
+
+
+def serve(monkeypatch, response):
+    class FakeSession:
+        def get(self, url, **kwargs):
+            return response
+
+    monkeypatch.setattr(source_cache, "_session", FakeSession())
+
+
+@pytest.mark.parametrize("content_type, html, apparent_encoding", [
+    ("text/html; charset=utf-8", "<p>café – naïve</p>", None),
+    ("text/html", '<meta charset="utf-8"><p>café – naïve</p>', None),
+    ("text/html", '<meta http-equiv="Content-Type" content="text/html; charset=UTF-8"><p>café – naïve</p>', None),
+    ("text/html", "<p>café – naïve</p>", "utf-8"),
+])
+def test_fetch_page_decodes_html_with_its_charset(monkeypatch, content_type, html, apparent_encoding):
+    serve(monkeypatch, FakeResponse(html.encode("utf-8"), content_type, apparent_encoding))
+    assert fetch_page("https://example.com")[1] == html
+
+
+def test_non_html_pages_go_to_the_document_parser(monkeypatch):
+    serve(monkeypatch, FakeResponse(b"%PDF-1.7 ...", "application/pdf"))
+    documents = []
+    cache = SourceCache(backend=MemoryBackend(), parse_html=FakeParser(),
+                        parse_document=lambda content: documents.append(content) or "pdf text")
+    assert cache.get_page_text("https://example.com/paper.pdf") == "pdf text"
+    assert documents == [b"%PDF-1.7 ..."]
+
+
+def test_file_backend_evicts_old_and_least_recently_used_entries(tmp_path):
+    backend = FileSystemBackend(str(tmp_path), max_bytes=250, max_age_seconds=3600)
+    backend.set("old", {"text": "x"})
+    old_path = backend._path("old")
+    os.utime(old_path, (time.time() - 7200, time.time() - 7200))
+    backend.set("a", {"text": "a" * 100})
+    assert backend.get("old") is None
+    backend.set("b", {"text": "b" * 100})
+    backend.get("a")  # now the most recently used
+    backend.set("c", {"text": "c" * 100})
+    assert backend.get("b") is None
+    assert backend.get("a") is not None and backend.get("c") is not None
+
+
+def test_file_backend_removes_its_temp_file_when_a_write_fails(tmp_path):
+    backend = FileSystemBackend(str(tmp_path))
+    with pytest.raises(TypeError):
+        backend.set("key", {"text": object()})
+    assert os.listdir(tmp_path) == []
+    backend.set("key", {"text": "ok"})
+    assert backend.get("key") == {"text": "ok"}
+    with open(backend._path("key"), encoding="utf-8") as f:
+        assert json.load(f) == {"text": "ok"}
@@ -0,0 +1,37 @@
+# URL normalization of source_identity.canonical_url
+
+import pytest
+
+pytest.importorskip("validators")
+
+from source_identity import canonical_url
+
+
+def test_mirrors_of_one_page_share_a_url():
+    expected = "https://example.com/news/story"
+    for url in ("http://www.example.com/news/story/",
+                "https://m.example.com/news/story#comments",
+                "https://amp.example.com/news/story/amp",
+                "https://www.google.com/amp/s/example.com/news/story",
+                "https://example.com/news/story?utm_source=x&fbclid=y"):
+        assert canonical_url(url) == expected
+
+
+def test_query_is_sorted():
+    assert canonical_url("https://example.com/search?q=a&page=2") == "https://example.com/search?page=2&q=a"
+
+
+def test_generic_parameters_are_kept():
+    assert canonical_url("https://github.com/o/r/compare?ref=main") == "https://github.com/o/r/compare?ref=main"
+    assert canonical_url("https://example.com/a?amp=1") == "https://example.com/a?amp=1"
+    assert canonical_url("https://example.com/a?si=2&feature=x") == "https://example.com/a?feature=x&si=2"
+
+
+def test_youtube_share_parameters_are_dropped():
+    assert canonical_url("https://www.youtube.com/playlist?list=PL1&si=abc&feature=shared") == \
+        "https://youtube.com/playlist?list=PL1"
+
+
+def test_only_a_trailing_amp_segment_is_stripped():
+    assert canonical_url("https://shop.com/audio/amp/specs") == "https://shop.com/audio/amp/specs"
+    assert canonical_url("https://example.com/story.amp.html") == "https://example.com/story.html"